@@ -4,7 +4,6 @@ from django.urls import reverse
 
 class StaticURLTests(TestCase):
     def setUp(self):
-        super().setUpClass()
         self.guest_client = Client()
 
     def test_pages_use_correct_template(self):
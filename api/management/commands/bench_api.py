@@ -0,0 +1,73 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.benchmark import rolled_back
+from posts.models import Comment, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность JSON API и HTML-страниц '
+        'с теми же данными, без кэша страниц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--posts', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with rolled_back(), override_settings(PAGE_CACHE_TIMEOUT=0):
+            pairs = self.populate(options['posts'])
+            self.run(pairs, options['requests'])
+
+    def populate(self, total):
+        author = User.objects.create(username='bench_api_author')
+        group = Group.objects.create(
+            title='bench', slug='bench-api-group', description='bench'
+        )
+        post = None
+        for i in range(total):
+            post = Post.objects.create(
+                text=f'bench {i} ' * 20, author=author, group=group
+            )
+        for i in range(10):
+            Comment.objects.create(post=post, author=author, text=f'bench {i}')
+        username = author.username
+        return (
+            ('лента', reverse('index'), reverse('api:posts')),
+            ('группа', reverse('group', args=(group.slug,)),
+             reverse('api:group_posts', args=(group.slug,))),
+            ('профиль', reverse('profile', args=(username,)),
+             reverse('api:user_posts', args=(username,))),
+            ('пост', reverse('post', args=(username, post.pk)),
+             reverse('api:post', args=(post.pk,))),
+        )
+
+    def throughput(self, client, url, requests):
+        cache.clear()
+        client.get(url)
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get(url)
+        return requests / (time.perf_counter() - started)
+
+    def run(self, pairs, requests):
+        client = Client()
+        self.stdout.write(
+            f'{"страница":<10}{"HTML, з/с":>12}{"JSON, з/с":>12}'
+            f'{"id,pub_date, з/с":>19}{"ускорение":>11}'
+        )
+        for name, html_url, api_url in pairs:
+            html = self.throughput(client, html_url, requests)
+            api = self.throughput(client, api_url, requests)
+            sparse = self.throughput(
+                client, f'{api_url}?fields=id,pub_date', requests
+            )
+            self.stdout.write(
+                f'{name:<10}{html:>12.1f}{api:>12.1f}{sparse:>19.1f}'
+                f'{api / html:>10.1f}x'
+            )
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from posts import generations
+
+LATEST_TIMEOUT = 60
+LRU_SIZE = 1024
+POLL_STEP = 0.5
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _key(scopes):
+    parts = generations.get([generations.SITE] + scopes)
+    return f'latest:{":".join(scopes)}:{".".join(parts)}'
+
+
+def _recall(key):
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        _lru.move_to_end(key)
+        return entry[1]
+
+
+def _remember(key, value):
+    with _lru_lock:
+        _lru[key] = (time.monotonic() + LATEST_TIMEOUT, value)
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def latest(scopes, posts):
+    """``pk`` and ``pub_date`` of the newest post of a feed, {} if empty.
+
+    The entry is keyed on the generations of the feed's scopes, which
+    every new post bumps, and kept in this process and in the shared
+    cache; ``posts`` is called for the newest-first queryset only when
+    both miss. So a feed with nothing new costs one cache read and no
+    query. Entries expire after LATEST_TIMEOUT in case one was loaded
+    just before the commit of a post it should have seen.
+    """
+    key = _key(scopes)
+    value = _recall(key)
+    if value is None:
+        value = cache.get(key)
+        if value is None:
+            value = posts().values('pk', 'pub_date').first() or {}
+            cache.set(key, value, LATEST_TIMEOUT)
+        _remember(key, value)
+    return value
+
+
+def is_newer(value, since):
+    field, bound = since
+    return bool(value) and value[field] > bound
+
+
+def wait_for_newer(scopes, posts, since, wait=0):
+    """latest(), after waiting up to ``wait`` seconds for it to be newer
+    than ``since``, a ``('pk', id)`` or ``('pub_date', date)`` pair."""
+    deadline = time.monotonic() + wait
+    while True:
+        value = latest(scopes, posts)
+        left = deadline - time.monotonic()
+        if is_newer(value, since) or left <= 0:
+            return value
+        time.sleep(min(POLL_STEP, left))
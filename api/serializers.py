@@ -0,0 +1,83 @@
+from posts.models import Post
+
+_storage = Post._meta.get_field('image').storage
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def _media_url(name):
+    return _storage.url(name) if name else None
+
+
+# Field name: the values() column it is read from and a conversion, if
+# the column is not JSON as is. Rows never become model instances.
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', _date),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _media_url),
+    'comments_count': ('comments_count', None),
+}
+
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'created': ('created', _date),
+    'author': ('author__username', None),
+}
+
+GROUP_FIELDS = {
+    'slug': ('slug', None),
+    'title': ('title', None),
+    'description': ('description', None),
+}
+
+USER_FIELDS = {
+    'username': ('username', None),
+    'first_name': ('first_name', None),
+    'last_name': ('last_name', None),
+    'posts_count': ('counters__posts_count', None),
+    'followers_count': ('counters__followers_count', None),
+    'following_count': ('counters__following_count', None),
+}
+
+
+def parse_fields(value, fields):
+    """The names asked for in ``?fields=``, all of them by default.
+
+    Raises ValueError listing the names ``fields`` does not have.
+    """
+    if not value:
+        return list(fields)
+    names = list(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return names
+
+
+def columns(names, fields, *extra):
+    """The columns to select for ``names``, plus ``extra`` ones.
+
+    Leaving out author or group also leaves out its join.
+    """
+    return list(dict.fromkeys(
+        [fields[name][0] for name in names] + list(extra)
+    ))
+
+
+def serialize(rows, names, fields):
+    spec = [(name,) + fields[name] for name in names]
+    return [
+        {
+            name: convert(row[column]) if convert else row[column]
+            for name, column, convert in spec
+        }
+        for row in rows
+    ]
@@ -0,0 +1,120 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from api import polling
+from posts.models import Follow, Group, Post, User
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class PollingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.old = Post.objects.create(
+            text='Старый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        polling._lru.clear()
+        self.client = Client()
+
+    def poll(self, name, *args, status=200, **params):
+        response = self.client.get(reverse(f'api:{name}', args=args), params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def publish(self, text='Новый пост'):
+        return Post.objects.create(
+            text=text, author=self.author, group=self.group
+        )
+
+    def test_idle_poll_makes_no_queries(self):
+        self.poll('posts_new', since_id=self.old.pk)
+        with self.assertNumQueries(0):
+            data = self.poll('posts_new', since_id=self.old.pk)
+        self.assertEqual(data, {
+            'latest_id': self.old.pk, 'count': 0, 'results': [],
+            'next_since_id': self.old.pk,
+        })
+
+    def test_new_posts_since_id(self):
+        self.poll('posts_new', since_id=self.old.pk)
+        first, second = self.publish('Первый'), self.publish('Второй')
+        data = self.poll('posts_new', since_id=self.old.pk, fields='id,text')
+        self.assertEqual(data['latest_id'], second.pk)
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['results'], [
+            {'id': first.pk, 'text': 'Первый'},
+            {'id': second.pk, 'text': 'Второй'},
+        ])
+        self.assertEqual(data['next_since_id'], second.pk)
+
+    def test_new_posts_are_paged_forward(self):
+        posts = [self.publish(f'Пост {i}') for i in range(5)]
+        since_id, seen = self.old.pk, []
+        while True:
+            data = self.poll(
+                'posts_new', since_id=since_id, limit=2, fields='id'
+            )
+            if not data['results']:
+                break
+            self.assertEqual(data['latest_id'], posts[-1].pk)
+            seen += [row['id'] for row in data['results']]
+            since_id = data['next_since_id']
+        self.assertEqual(seen, [post.pk for post in posts])
+
+    def test_count_since_timestamp(self):
+        post = self.publish()
+        for since in (self.old.pub_date.isoformat(),
+                      self.old.pub_date.timestamp()):
+            data = self.poll('posts_new', since=since, count=1)
+            self.assertEqual(
+                data, {'latest_id': post.pk, 'count': 1}
+            )
+
+    def test_group_and_user_feeds(self):
+        post = self.publish()
+        for name, arg in (('group_posts_new', 'group'),
+                          ('user_posts_new', 'author')):
+            data = self.poll(name, arg, since_id=self.old.pk, fields='id')
+            self.assertEqual(data['results'], [{'id': post.pk}])
+        self.poll('group_posts_new', 'missing', since_id=0, status=404)
+
+    def test_follow_feed(self):
+        self.poll('feed_new', since_id=0, status=401)
+        self.client.force_login(self.reader)
+        self.poll('feed_new', since_id=self.old.pk)
+        post = self.publish()
+        data = self.poll('feed_new', since_id=self.old.pk, count=1)
+        self.assertEqual(data, {'latest_id': post.pk, 'count': 1})
+
+    def test_long_poll_returns_when_post_appears(self):
+        posts = []
+        with mock.patch('api.polling.time.sleep') as sleep:
+            sleep.side_effect = lambda seconds: posts.append(self.publish())
+            data = self.poll(
+                'posts_new', since_id=self.old.pk, wait=10, fields='id'
+            )
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(data['results'], [{'id': posts[0].pk}])
+
+    def test_long_poll_gives_up_after_wait(self):
+        started = time.monotonic()
+        data = self.poll('posts_new', since_id=self.old.pk, wait=0.2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(data['count'], 0)
+
+    def test_bad_parameters(self):
+        self.poll('posts_new', status=400)
+        self.poll('posts_new', since='вчера', status=400)
+        self.poll('posts_new', since_id=0, wait=3600, status=400)
@@ -0,0 +1,129 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(15):
+            Post.objects.create(
+                text=f'Тестовый текст {i}', author=cls.author,
+                group=cls.group if i % 2 else None
+            )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-id'))
+        cls.post = cls.posts[0]
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, *args, status=200, **params):
+        response = self.client.get(reverse(f'api:{name}', args=args), params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_posts_walk_by_cursor(self):
+        first = self.get('posts')
+        self.assertEqual(
+            [post['id'] for post in first['results']],
+            [post.pk for post in self.posts[:10]]
+        )
+        self.assertIsNone(first['previous'])
+        second = self.get('posts', after=first['next'])
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.pk for post in self.posts[10:]]
+        )
+        self.assertIsNone(second['next'])
+        back = self.get('posts', before=second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_post_fields(self):
+        post = self.get('posts', limit=1)['results'][0]
+        self.assertEqual(post, {
+            'id': self.post.pk,
+            'text': self.post.text,
+            'pub_date': self.post.pub_date.isoformat(),
+            'author': 'author',
+            'group': None,
+            'image': None,
+            'comments_count': 3,
+        })
+
+    def test_sparse_fields_skip_joins(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('api:posts'), {'fields': 'id,text', 'limit': 3}
+            )
+        self.assertNotIn(b'author', response.content)
+        self.assertEqual(
+            list(response.json()['results'][0]), ['id', 'text']
+        )
+
+    def test_bad_parameters(self):
+        self.assertIn(
+            'nope', self.get('posts', status=400, fields='id,nope')['detail']
+        )
+        self.get('posts', status=400, limit=0)
+        self.get('posts', status=400, limit='много')
+
+    def test_group_and_user(self):
+        self.assertEqual(self.get('group', 'group')['title'], 'Группа')
+        self.assertEqual(len(self.get('group_posts', 'group')['results']), 7)
+        user = self.get('user', 'author')
+        self.assertEqual(user['posts_count'], 15)
+        self.assertEqual(user['followers_count'], 1)
+        self.assertEqual(
+            len(self.get('user_posts', 'author', limit=20)['results']), 15
+        )
+        self.get('group', 'missing', status=404)
+        self.get('user_posts', 'missing', status=404)
+
+    def test_post_detail_pages_comments(self):
+        post = self.get('post', self.post.pk, limit=2)
+        self.assertEqual(
+            [comment['text'] for comment in post['comments']['results']],
+            ['Комментарий 2', 'Комментарий 1']
+        )
+        rest = self.get(
+            'comments', self.post.pk, after=post['comments']['next']
+        )
+        self.assertEqual(
+            [comment['author'] for comment in rest['results']], ['reader']
+        )
+        self.get('post', 0, status=404)
+
+    def test_feed_requires_login(self):
+        self.get('feed', status=401)
+        self.client.force_login(self.reader)
+        for engine in ('timeline', 'merge'):
+            feed = self.get('feed', engine=engine, fields='id')
+            self.assertEqual(
+                feed['results'], [{'id': post.pk} for post in self.posts[:10]]
+            )
+
+    def test_only_safe_methods(self):
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_not_modified(self):
+        response = self.client.get(reverse('api:posts'))
+        response = self.client.get(
+            reverse('api:posts'), HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
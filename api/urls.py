@@ -0,0 +1,68 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path(
+        'posts/',
+        views.posts,
+        name='posts'
+    ),
+    path(
+        'posts/new/',
+        views.posts_new,
+        name='posts_new'
+    ),
+    path(
+        'posts/<int:post_id>/',
+        views.post_detail,
+        name='post'
+    ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
+    path(
+        'groups/<slug:slug>/',
+        views.group_detail,
+        name='group'
+    ),
+    path(
+        'groups/<slug:slug>/posts/',
+        views.group_posts,
+        name='group_posts'
+    ),
+    path(
+        'groups/<slug:slug>/posts/new/',
+        views.group_posts_new,
+        name='group_posts_new'
+    ),
+    path(
+        'users/<str:username>/',
+        views.user_detail,
+        name='user'
+    ),
+    path(
+        'users/<str:username>/posts/',
+        views.user_posts,
+        name='user_posts'
+    ),
+    path(
+        'users/<str:username>/posts/new/',
+        views.user_posts_new,
+        name='user_posts_new'
+    ),
+    path(
+        'feed/',
+        views.feed,
+        name='feed'
+    ),
+    path(
+        'feed/new/',
+        views.feed_new,
+        name='feed_new'
+    ),
+]
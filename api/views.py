@@ -0,0 +1,374 @@
+import json
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from posts.feeds import MergeFeedPaginator, cursor_prefix, feed_engine
+from posts.generations import INDEX, author_scope, group_scope
+from posts.models import Comment, Follow, Group, Post, User
+from posts.page_cache import cache_anonymous_page, conditional_page
+from posts.paginator import POSTS_PER_PAGE, CursorPaginator
+from posts.views import (
+    author_scopes, follow_scopes, group_scopes, index_scopes
+)
+
+from . import polling
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, USER_FIELDS, columns,
+    parse_fields, serialize
+)
+
+MAX_LIMIT = 100
+NEW_COUNT_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+        content_type='application/json',
+        status=status
+    )
+
+
+def api_view(view):
+    """GET and HEAD only, with errors answered as JSON."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return json_response({'detail': 'Не найдено'}, 404)
+        except ApiError as error:
+            return json_response({'detail': error.detail}, error.status)
+    return wrapper
+
+
+def authenticated(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError(401, 'Требуется вход')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class RowsMixin:
+    # Pages hold values() rows, not posts.
+    def _key(self, item):
+        return item[self.date_field], item[self.id_field]
+
+
+class RowPaginator(RowsMixin, CursorPaginator):
+    pass
+
+
+class MergeRowPaginator(RowsMixin, MergeFeedPaginator):
+    def __init__(self, author_ids, per_page, rows):
+        super().__init__(author_ids, per_page)
+        self.object_list = rows
+
+    def _load(self, pks):
+        return {row['id']: row for row in self.object_list.filter(pk__in=pks)}
+
+
+def _fields(request, fields):
+    try:
+        return parse_fields(request.GET.get('fields'), fields)
+    except ValueError as error:
+        raise ApiError(400, f'Неизвестные поля: {error}')
+
+
+def _limit(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return POSTS_PER_PAGE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(400, f'limit должен быть от 1 до {MAX_LIMIT}')
+    return limit
+
+
+def _cursors(request):
+    return {
+        'after': request.GET.get('after'),
+        'before': request.GET.get('before'),
+    }
+
+
+def _page(paginator, names, fields, after=None, before=None):
+    page = paginator.get_cursor_page(after=after, before=before)
+    return {
+        'results': serialize(page, names, fields),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _pk(queryset, **lookup):
+    pk = queryset.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+def _post_list(request, posts):
+    names = _fields(request, POST_FIELDS)
+    rows = posts.values(*columns(names, POST_FIELDS, 'pub_date', 'id'))
+    paginator = RowPaginator(rows, _limit(request))
+    return json_response(
+        _page(paginator, names, POST_FIELDS, **_cursors(request))
+    )
+
+
+def _comments(post_id, limit, after=None, before=None):
+    rows = Comment.objects.filter(post_id=post_id).values(
+        *columns(COMMENT_FIELDS, COMMENT_FIELDS)
+    )
+    paginator = RowPaginator(rows, limit, date_field='created')
+    return _page(
+        paginator, list(COMMENT_FIELDS), COMMENT_FIELDS, after, before
+    )
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    try:
+        date = parse_datetime(value)
+    except ValueError:
+        return None
+    if date is not None and is_naive(date):
+        date = make_aware(date)
+    return date
+
+
+def _since(request):
+    since_id, since = request.GET.get('since_id'), request.GET.get('since')
+    if since_id is not None and since_id.isdigit():
+        return 'pk', int(since_id)
+    date = _parse_date(since) if since_id is None and since else None
+    if date is None:
+        raise ApiError(
+            400, 'Нужен since_id или since: время в ISO 8601 или Unix'
+        )
+    return 'pub_date', date
+
+
+def _wait(request):
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = -1
+    if not 0 <= wait <= settings.API_LONG_POLL_MAX:
+        raise ApiError(
+            400, f'wait должен быть от 0 до {settings.API_LONG_POLL_MAX}'
+        )
+    return wait
+
+
+def _new_posts(request, scopes, posts):
+    """Posts of a feed newer than ``since_id`` or ``since``, oldest first.
+
+    ``posts`` returns the feed newest first. At most ``limit`` posts
+    right after ``since`` are returned, with the ``next_since_id`` to
+    poll from for the rest; ``latest_id`` is the newest post of the
+    feed. With ``?count=1`` only their number, at most NEW_COUNT_LIMIT,
+    is returned; ``?wait=`` holds the request until there is something
+    new. Nothing new is answered from polling.latest() without a query.
+    """
+    since = _since(request)
+    wait = _wait(request)
+    count_only = request.GET.get('count') == '1'
+    names = [] if count_only else _fields(request, POST_FIELDS)
+    limit = _limit(request)
+    newest = polling.wait_for_newer(scopes, posts, since, wait)
+    data = {'latest_id': newest.get('pk'), 'count': 0}
+    if not count_only:
+        data.update(results=[], next_since_id=newest.get('pk'))
+    if polling.is_newer(newest, since):
+        newer = posts().filter(**{f'{since[0]}__gt': since[1]})
+        data['count'] = newer.order_by()[:NEW_COUNT_LIMIT].count()
+        if not count_only:
+            rows = list(
+                newer.reverse().values(*columns(names, POST_FIELDS, 'id'))
+                [:limit]
+            )
+            data.update(
+                results=serialize(rows, names, POST_FIELDS),
+                next_since_id=rows[-1]['id'] if rows else newest['pk']
+            )
+    return json_response(data)
+
+
+def post_scopes(request, post_id):
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    return [author_scope(username)] if username else []
+
+
+@api_view
+@conditional_page(index_scopes)
+@cache_anonymous_page(index_scopes)
+def posts(request):
+    return _post_list(request, Post.objects.all())
+
+
+@api_view
+@conditional_page(post_scopes)
+@cache_anonymous_page(post_scopes)
+def post_detail(request, post_id):
+    names = _fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *columns(names, POST_FIELDS)
+    ).first()
+    if row is None:
+        raise Http404
+    data, = serialize([row], names, POST_FIELDS)
+    # The first page; further ones come from post_comments.
+    data['comments'] = _comments(post_id, _limit(request))
+    return json_response(data)
+
+
+@api_view
+@conditional_page(post_scopes)
+@cache_anonymous_page(post_scopes)
+def post_comments(request, post_id):
+    post_id = _pk(Post.objects, pk=post_id)
+    return json_response(
+        _comments(post_id, _limit(request), **_cursors(request))
+    )
+
+
+@api_view
+@conditional_page(group_scopes)
+@cache_anonymous_page(group_scopes)
+def group_detail(request, slug):
+    row = Group.objects.filter(slug=slug).values(
+        *columns(GROUP_FIELDS, GROUP_FIELDS)
+    ).first()
+    if row is None:
+        raise Http404
+    data, = serialize([row], list(GROUP_FIELDS), GROUP_FIELDS)
+    return json_response(data)
+
+
+@api_view
+@conditional_page(group_scopes)
+@cache_anonymous_page(group_scopes)
+def group_posts(request, slug):
+    group_id = _pk(Group.objects, slug=slug)
+    return _post_list(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view
+@conditional_page(author_scopes)
+@cache_anonymous_page(author_scopes)
+def user_detail(request, username):
+    row = User.objects.filter(username=username).values(
+        *columns(USER_FIELDS, USER_FIELDS)
+    ).first()
+    if row is None:
+        raise Http404
+    data, = serialize([row], list(USER_FIELDS), USER_FIELDS)
+    return json_response(data)
+
+
+@api_view
+@conditional_page(author_scopes)
+@cache_anonymous_page(author_scopes)
+def user_posts(request, username):
+    author_id = _pk(User.objects, username=username)
+    return _post_list(request, Post.objects.filter(author_id=author_id))
+
+
+@api_view
+@authenticated
+@conditional_page(follow_scopes)
+def feed(request):
+    names = _fields(request, POST_FIELDS)
+    limit = _limit(request)
+    engine = feed_engine(request)
+    if engine == 'merge':
+        author_ids = Follow.objects.filter(user=request.user).values_list(
+            'author_id', flat=True
+        )
+        rows = Post.objects.values(
+            *columns(names, POST_FIELDS, 'pub_date', 'id')
+        )
+        paginator = MergeRowPaginator(author_ids, limit, rows)
+    else:
+        rows = Post.objects.timeline(request.user).values(
+            *columns(names, POST_FIELDS, 'timeline_date', 'timeline_id')
+        )
+        paginator = RowPaginator(
+            rows, limit, date_field='timeline_date', id_field='timeline_id'
+        )
+    paginator.cursor_prefix = cursor_prefix(engine)
+    return json_response(
+        _page(paginator, names, POST_FIELDS, **_cursors(request))
+    )
+
+
+@api_view
+@never_cache
+def posts_new(request):
+    return _new_posts(
+        request, [INDEX],
+        lambda: Post.objects.order_by('-pub_date', '-id')
+    )
+
+
+@api_view
+@never_cache
+def group_posts_new(request, slug):
+    return _new_posts(
+        request, [group_scope(slug)],
+        lambda: Post.objects.filter(
+            group_id=_pk(Group.objects, slug=slug)
+        ).order_by('-pub_date', '-id')
+    )
+
+
+@api_view
+@never_cache
+def user_posts_new(request, username):
+    return _new_posts(
+        request, [author_scope(username)],
+        lambda: Post.objects.filter(
+            author_id=_pk(User.objects, username=username)
+        ).order_by('-pub_date', '-id')
+    )
+
+
+@api_view
+@authenticated
+@never_cache
+def feed_new(request):
+    # The timeline holds every followed post whichever engine pages
+    # the feed, and fan-out bumps INDEX once it is written.
+    return _new_posts(
+        request, follow_scopes(request),
+        lambda: Post.objects.timeline(request.user).order_by(
+            '-timeline_date', '-timeline_id'
+        )
+    )
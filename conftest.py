@@ -0,0 +1,12 @@
+import pytest
+
+from yatube.testing import TestSettings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_settings():
+    # Like yatube.testing.DiscoverRunner for manage.py test.
+    session = TestSettings()
+    session.enable()
+    yield
+    session.disable()
@@ -0,0 +1,28 @@
+import base64
+import pickle
+
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .queue import defer
+
+
+def encode(message):
+    message.connection = None
+    return base64.b64encode(pickle.dumps(message)).decode()
+
+
+def decode(value):
+    return pickle.loads(base64.b64decode(value))
+
+
+class EmailBackend(BaseEmailBackend):
+    """Queues messages for the run_jobs worker instead of sending them.
+
+    The worker sends each through JOBS_EMAIL_BACKEND as a job of its
+    own, so a failed send is retried without resending the others.
+    """
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            defer('jobs.send_email', message=encode(message))
+        return len(email_messages)
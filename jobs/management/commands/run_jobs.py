@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import work
+
+
+class Command(BaseCommand):
+    help = 'Выполняет отложенные задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда очередь опустеет'
+        )
+        parser.add_argument('--poll-interval', type=float)
+
+    def handle(self, *args, **options):
+        total = 0
+        for name, done, claimed in work(
+                options['once'], options['poll_interval']):
+            total += done
+            self.stdout.write(f'{name}: выполнено {done} из {claimed}')
+        self.stdout.write(f'Всего выполнено: {total}')
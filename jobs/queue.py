@@ -0,0 +1,226 @@
+import json
+import logging
+import random
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5
+BACKOFF_MAX = 60 * 60
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, batch_size, max_attempts):
+        self.func = func
+        self.name = name
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def defer(self, **payload):
+        return defer(self.name, **payload)
+
+    def run(self, payloads):
+        # Batched tasks get every payload at once, the rest one by one.
+        if self.batch_size > 1:
+            self.func(payloads)
+        else:
+            for payload in payloads:
+                self.func(**payload)
+
+
+def task(name, batch_size=1, max_attempts=MAX_ATTEMPTS):
+    """Register a function as a job.
+
+    With ``batch_size`` above 1 it is called with a list of up to that
+    many payloads of queued jobs instead of one payload's keywords.
+    """
+    def register(func):
+        _registry[name] = Task(func, name, batch_size, max_attempts)
+        return _registry[name]
+    return register
+
+
+def defer(task_name, **payload):
+    """Queue a job, in the caller's transaction.
+
+    The job becomes visible to workers when that transaction commits
+    and is rolled back with it. With JOBS_ALWAYS_EAGER it runs right
+    away instead.
+    """
+    task = _registry[task_name]
+    encoded = json.dumps(payload, cls=DjangoJSONEncoder)
+    if settings.JOBS_ALWAYS_EAGER:
+        task.run([json.loads(encoded)])
+        return None
+    return Job.objects.create(name=task_name, payload=encoded)
+
+
+def _ready(now):
+    # A running job whose lease ran out belongs to a dead worker.
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, lease_until__lt=now)
+    )
+
+
+def _claim(candidates, ready, limit, now):
+    ids = list(candidates.values_list('pk', flat=True)[:limit])
+    token = uuid.uuid4().hex
+    # Repeating the ready condition makes the UPDATE a compare-and-set:
+    # a job taken by another worker in between is no longer matched.
+    ready.filter(pk__in=ids).update(
+        status=Job.RUNNING,
+        claim_token=token,
+        lease_until=now + timedelta(seconds=settings.JOBS_LEASE),
+        attempts=F('attempts') + 1
+    )
+    return list(Job.objects.filter(claim_token=token).order_by('run_at'))
+
+
+def claim():
+    """Take the next batch of ready jobs of one task for this worker.
+
+    Returns the task and its jobs, or (None, []) when nothing is ready.
+    Where the database has SELECT ... FOR UPDATE SKIP LOCKED, workers
+    skip each other's candidates; on SQLite, where writes are serialized
+    anyway, the guarded UPDATE alone decides who gets a job.
+    """
+    now = timezone.now()
+    ready = _ready(now)
+    name = ready.order_by('run_at').values_list('name', flat=True).first()
+    if name is None:
+        return None, []
+    task = _registry.get(name)
+    if task is None:
+        ready.filter(name=name).update(
+            status=Job.FAILED, last_error='Неизвестная задача'
+        )
+        return None, []
+    candidates = ready.filter(name=name).order_by('run_at')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = _claim(
+                candidates.select_for_update(skip_locked=True),
+                ready, task.batch_size, now
+            )
+    else:
+        jobs = _claim(candidates, ready, task.batch_size, now)
+    return task, jobs
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _done_key(name):
+    return f'jobs:done:{name}'
+
+
+def _fail(task, job, error):
+    if job.attempts >= task.max_attempts:
+        changes = {'status': Job.FAILED}
+    else:
+        changes = {
+            'status': Job.QUEUED,
+            'run_at': timezone.now() + timedelta(
+                seconds=backoff(job.attempts)
+            ),
+        }
+    Job.objects.filter(pk=job.pk, claim_token=job.claim_token).update(
+        last_error=error, lease_until=None, **changes
+    )
+
+
+def execute(task, jobs):
+    """Run claimed jobs; returns how many succeeded.
+
+    When a batch fails its jobs are retried one by one, so a single bad
+    payload only delays itself; batched tasks must therefore be safe to
+    run again for the payloads that did go through.
+    """
+    try:
+        task.run([json.loads(job.payload) for job in jobs])
+    except Exception:
+        if len(jobs) > 1:
+            return sum(execute(task, [job]) for job in jobs)
+        logger.exception('Задача %s не выполнена', jobs[0])
+        _fail(task, jobs[0], traceback.format_exc())
+        return 0
+    # A job whose lease ran out may have been claimed by another worker
+    # meanwhile; it is that worker's to finish, under its claim token.
+    done, _ = Job.objects.filter(
+        pk__in=[job.pk for job in jobs], claim_token=jobs[0].claim_token
+    ).delete()
+    cache.add(_done_key(task.name), 0, None)
+    cache.incr(_done_key(task.name), done)
+    return done
+
+
+def work(once=False, poll_interval=None):
+    """The worker loop; with ``once`` it returns when the queue is empty.
+
+    Yields the task name and the done and claimed counts of every batch.
+    """
+    poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+    while True:
+        if not once:
+            # A long-running worker outlives CONN_MAX_AGE and failed
+            # connections like a request would.
+            close_old_connections()
+        task, jobs = claim()
+        if jobs:
+            yield task.name, execute(task, jobs), len(jobs)
+        elif once:
+            return
+        else:
+            time.sleep(poll_interval)
+
+
+def stats():
+    """Queue depth, failures and throughput of every task."""
+    now = timezone.now()
+    rows = {
+        row['name']: row for row in
+        Job.objects.values('name').annotate(
+            ready=Count('pk', filter=Q(status=Job.QUEUED, run_at__lte=now)),
+            waiting=Count('pk', filter=Q(status=Job.QUEUED, run_at__gt=now)),
+            running=Count('pk', filter=Q(status=Job.RUNNING)),
+            failed=Count('pk', filter=Q(status=Job.FAILED)),
+            oldest=Min('run_at', filter=Q(status=Job.QUEUED, run_at__lte=now)),
+        ).order_by()
+    }
+    names = sorted(set(_registry) | set(rows))
+    done = cache.get_many([_done_key(name) for name in names])
+    result = []
+    for name in names:
+        row = rows.get(name, {
+            'ready': 0, 'waiting': 0, 'running': 0, 'failed': 0,
+            'oldest': None,
+        })
+        row.update(
+            name=name,
+            done=done.get(_done_key(name), 0),
+            lag=(now - row['oldest']).total_seconds()
+            if row['oldest'] else 0,
+        )
+        result.append(row)
+    return result
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.mail import get_connection
+
+from .backends import decode
+from .queue import task
+
+
+# One message per job: a batch that failed halfway would be retried
+# whole and send its first messages twice.
+@task('jobs.send_email')
+def send_email(message):
+    connection = get_connection(settings.JOBS_EMAIL_BACKEND)
+    connection.send_messages([decode(message)])
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import (
+    EmailBackend as LocMemEmailBackend
+)
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+calls = []
+
+
+@queue.task('tests.record')
+def record(value):
+    if value == 'bad':
+        raise ValueError(value)
+    calls.append([value])
+
+
+@queue.task('tests.record_batch', batch_size=3, max_attempts=2)
+def record_batch(payloads):
+    values = [payload['value'] for payload in payloads]
+    if 'bad' in values:
+        raise ValueError(values)
+    calls.append(values)
+
+
+@override_settings(
+    JOBS_ALWAYS_EAGER=False,
+    JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+)
+class QueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+
+    def run_jobs(self):
+        call_command('run_jobs', once=True, stdout=StringIO())
+
+    def test_deferred_job_runs_in_worker(self):
+        job = queue.defer('tests.record', value='one')
+        self.assertEqual(calls, [])
+        self.assertEqual(job.status, Job.QUEUED)
+        self.run_jobs()
+        self.assertEqual(calls, [['one']])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_ALWAYS_EAGER=True)
+    def test_eager_job_runs_inline(self):
+        self.assertIsNone(queue.defer('tests.record', value='one'))
+        self.assertEqual(calls, [['one']])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claimed_job_is_not_claimed_again(self):
+        queue.defer('tests.record', value='one')
+        task, jobs = queue.claim()
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0].status, Job.RUNNING)
+        self.assertEqual(queue.claim(), (None, []))
+
+    def test_expired_lease_is_claimed_again(self):
+        queue.defer('tests.record', value='one')
+        _, jobs = queue.claim()
+        Job.objects.update(lease_until=timezone.now() - timedelta(seconds=1))
+        _, again = queue.claim()
+        self.assertEqual([job.pk for job in again], [jobs[0].pk])
+        self.assertEqual(again[0].attempts, 2)
+
+    def test_failed_job_is_retried_later(self):
+        queue.defer('tests.record', value='bad')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.run_jobs()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ValueError', job.last_error)
+
+    def test_failing_batch_only_holds_back_bad_job(self):
+        for value in ('one', 'bad', 'two'):
+            queue.defer('tests.record_batch', value=value)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            task, jobs = queue.claim()
+            self.assertEqual(queue.execute(task, jobs), 2)
+        self.assertEqual(calls, [['one'], ['two']])
+        self.assertEqual(Job.objects.get().attempts, 1)
+
+    def test_job_fails_after_max_attempts(self):
+        queue.defer('tests.record_batch', value='bad')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            for _ in range(2):
+                Job.objects.update(run_at=timezone.now())
+                self.run_jobs()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+        row, = [row for row in queue.stats()
+                if row['name'] == 'tests.record_batch']
+        self.assertEqual(row['failed'], 1)
+
+    def test_mail_is_sent_by_worker_once(self):
+        with self.settings(EMAIL_BACKEND='jobs.backends.EmailBackend'):
+            for i in range(3):
+                mail.send_mail(f'Тема {i}', 'Текст', 'from@example.com',
+                               ['to@example.com'])
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.count(), 3)
+        send = LocMemEmailBackend.send_messages
+
+        def fail_second(backend, messages):
+            if messages[0].subject == 'Тема 1':
+                raise ConnectionError('SMTP')
+            return send(backend, messages)
+
+        with mock.patch.object(
+                LocMemEmailBackend, 'send_messages', fail_second), \
+                self.assertLogs('jobs.queue', 'ERROR'):
+            self.run_jobs()
+        Job.objects.update(run_at=timezone.now())
+        self.run_jobs()
+        self.assertEqual(
+            sorted(message.subject for message in mail.outbox),
+            ['Тема 0', 'Тема 1', 'Тема 2']
+        )
+
+    def test_job_claimed_by_another_worker_is_not_deleted(self):
+        queue.defer('tests.record', value='one')
+        task, jobs = queue.claim()
+        Job.objects.update(lease_until=timezone.now() - timedelta(seconds=1))
+        _, again = queue.claim()
+        self.assertEqual(queue.execute(task, jobs), 0)
+        self.assertEqual(Job.objects.get().claim_token, again[0].claim_token)
+        self.assertEqual(queue.execute(task, again), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_stats_page_is_for_staff(self):
+        queue.defer('tests.record', value='one')
+        user = get_user_model().objects.create(username='staff')
+        client = Client()
+        client.force_login(user)
+        self.assertEqual(
+            client.get(reverse('jobs:stats')).status_code, 302
+        )
+        user.is_staff = True
+        user.save()
+        response = client.get(reverse('jobs:stats'))
+        row, = [row for row in response.context['rows']
+                if row['name'] == 'tests.record']
+        self.assertEqual(row['ready'], 1)
@@ -0,0 +1,16 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
+
+from . import queue
+
+
+@staff_member_required
+def stats(request):
+    context = {
+        'rows': queue.stats()
+    }
+    return render(
+        request,
+        'jobs/stats.html',
+        context
+    )
@@ -1,13 +1,67 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 
+from . import bulk, search
 from .models import Comment, Group, Post
+from .paginator import EstimatedCountPaginator
+
+
+class MoveToGroupForm(ActionForm):
+    group = forms.SlugField(
+        required=False,
+        label='Адрес группы:'
+    )
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author')
+    list_select_related = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    autocomplete_fields = ('author', 'group')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = MoveToGroupForm
+    actions = ('delete_in_chunks', 'move_to_group')
+
+    def get_actions(self, request):
+        # The stock action loads every selected post for its
+        # confirmation page and deletes them in one long transaction.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.enabled() or not search.match_expression(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        return search.search_filter(queryset, search_term), False
+
+    def delete_in_chunks(self, request, queryset):
+        deleted = bulk.delete_posts(queryset)
+        self.message_user(request, f'Удалено постов: {deleted}')
+
+    delete_in_chunks.short_description = 'Удалить выбранные посты'
+    delete_in_chunks.allowed_permissions = ('delete',)
+
+    def move_to_group(self, request, queryset):
+        group = Group.objects.filter(slug=request.POST.get('group')).first()
+        if group is None:
+            self.message_user(
+                request,
+                'Укажите адрес существующей группы',
+                messages.ERROR
+            )
+            return
+        moved = bulk.move_posts(queryset, group)
+        self.message_user(
+            request,
+            f'Перенесено в группу «{group.title}»: {moved}'
+        )
+
+    move_to_group.short_description = 'Перенести выбранные посты в группу'
+    move_to_group.allowed_permissions = ('change',)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -19,8 +73,13 @@ class GroupAdmin(admin.ModelAdmin):
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'post', 'text', 'created', 'author')
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
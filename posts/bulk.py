@@ -0,0 +1,97 @@
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from . import generations, search, storage
+from .feeds import head_key
+from .models import Comment, Post, TimelineEntry, UserCounters
+
+BULK_BATCH_SIZE = 500
+
+
+def _chunks(queryset, batch_size):
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = 0
+    while True:
+        chunk = list(pks.filter(pk__gt=last)[:batch_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def _page_scopes(rows):
+    scopes = {generations.INDEX}
+    for username, slug in rows:
+        scopes.add(generations.author_scope(username))
+        if slug:
+            scopes.add(generations.group_scope(slug))
+    return scopes
+
+
+def forget_posts(rows):
+    """Update everything that outlives deleted posts.
+
+    ``rows`` are ``(pk, author_id, author username, group slug, image)``
+    of the deleted posts. The post_delete receiver in posts.signals passes one
+    row, delete_posts a whole chunk, which costs the same statements:
+    author counters, feed heads, the search index and page generations.
+    Images are released once the deletion is committed.
+    """
+    authors = Counter(author_id for _, author_id, _, _, _ in rows)
+    by_count = defaultdict(list)
+    for author_id, count in authors.items():
+        by_count[count].append(author_id)
+    for count, author_ids in by_count.items():
+        UserCounters.objects.filter(user_id__in=author_ids).update(
+            posts_count=F('posts_count') - count
+        )
+    cache.delete_many([head_key(author_id) for author_id in authors])
+    search.remove_posts([pk for pk, _, _, _, _ in rows])
+    generations.bump(*_page_scopes(
+        (username, slug) for _, _, username, slug, _ in rows
+    ))
+    images = [image for _, _, _, _, image in rows if image]
+    if images:
+        transaction.on_commit(partial(storage.release, images))
+
+
+def delete_posts(queryset, batch_size=BULK_BATCH_SIZE):
+    """Delete posts chunk by chunk, one short transaction per chunk.
+
+    A chunk costs one DELETE per table instead of the per-row signals of
+    ``QuerySet.delete()``, then goes through forget_posts like a single
+    deleted post does.
+    """
+    deleted = 0
+    for chunk in _chunks(queryset, batch_size):
+        with transaction.atomic():
+            posts = Post.objects.filter(pk__in=chunk)
+            rows = list(posts.values_list(
+                'pk', 'author_id', 'author__username', 'group__slug', 'image'
+            ))
+            # Raw deletes skip the per-comment signals, whose only job
+            # is to update the posts that are going away.
+            for related in (Comment, TimelineEntry):
+                related.objects.filter(post__in=chunk)._raw_delete(posts.db)
+            deleted += posts._raw_delete(posts.db)
+            forget_posts(rows)
+    return deleted
+
+
+def move_posts(queryset, group, batch_size=BULK_BATCH_SIZE):
+    """Move posts to ``group`` with one UPDATE per chunk."""
+    moved = 0
+    for chunk in _chunks(queryset.exclude(group=group), batch_size):
+        with transaction.atomic():
+            posts = Post.objects.filter(pk__in=chunk)
+            rows = list(posts.values_list('author__username', 'group__slug'))
+            moved += posts.update(group=group, version=F('version') + 1)
+            search.retitle_posts(chunk, group.title)
+            generations.bump(
+                generations.group_scope(group.slug), *_page_scopes(rows)
+            )
+    return moved
@@ -0,0 +1,73 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def bump_user(user_id, **deltas):
+    UserCounters.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def bump_post(post_id, delta=0):
+    # Any change to what a post renders bumps its version, which keys
+    # its cached fragment (see posts.fragments).
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        version=F('version') + 1
+    )
+
+
+def bump_group(group_id):
+    Group.objects.filter(pk=group_id).update(version=F('version') + 1)
+
+
+def _count(queryset, field, outer='pk'):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def _ranges(queryset, batch_size):
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    start = 0
+    while True:
+        bounds = list(pks.filter(pk__gt=start)[:batch_size])
+        if not bounds:
+            return
+        yield bounds[0], bounds[-1]
+        start = bounds[-1]
+
+
+def recount(batch_size=10000):
+    """Recompute every stored counter from scratch, one UPDATE per batch."""
+    missing = User.objects.filter(counters__isnull=True)
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk)
+         for pk in missing.values_list('pk', flat=True).iterator()),
+        batch_size=batch_size
+    )
+    users = 0
+    for low, high in _ranges(UserCounters.objects, batch_size):
+        users += UserCounters.objects.filter(
+            pk__gte=low, pk__lte=high
+        ).update(
+            posts_count=_count(Post.objects, 'author', 'user_id'),
+            followers_count=_count(Follow.objects, 'author', 'user_id'),
+            following_count=_count(Follow.objects, 'user', 'user_id'),
+        )
+    posts = 0
+    for low, high in _ranges(Post.objects, batch_size):
+        posts += Post.objects.filter(pk__gte=low, pk__lte=high).update(
+            comments_count=_count(Comment.objects, 'post')
+        )
+    return users, posts
@@ -0,0 +1,198 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Follow, Post, UserCounters
+from .paginator import (
+    POSTS_PER_PAGE, CursorPaginator, cursors, keyset_filter
+)
+
+HEAD_SIZE = 50
+HEAD_TIMEOUT = 60 * 60
+HEAD_CHUNK = 500
+ENGINES = ('timeline', 'merge')
+
+
+def head_key(author_id):
+    return f'feed:head:{author_id}'
+
+
+def invalidate_head(author_id):
+    cache.delete(head_key(author_id))
+
+
+def _ranked_keys(author_ids, size, cursor=None, older=True):
+    # Up to ``size`` keys of every author past ``cursor``, newest first
+    # when ``older``, oldest first otherwise.
+    keys = {author_id: [] for author_id in author_ids}
+    posts = Post.objects.filter(author_id__in=author_ids)
+    if cursor is not None:
+        posts = keyset_filter(posts, cursor, older)
+    order = (F('pub_date'), F('id'))
+    ranked = posts.annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[
+                field.desc() if older else field.asc() for field in order
+            ]
+        )
+    ).values('id', 'author_id', 'pub_date', 'rank')
+    sql, params = ranked.query.sql_with_params()
+    rows = Post.objects.raw(
+        f'SELECT "id", "author_id", "pub_date" FROM ({sql}) '
+        f'WHERE "rank" <= %s ORDER BY "author_id", "rank"',
+        params + (size,)
+    )
+    for post in rows:
+        keys[post.author_id].append((post.pub_date, post.pk))
+    return keys
+
+
+def _load_heads(author_ids):
+    return _ranked_keys(author_ids, HEAD_SIZE)
+
+
+def author_heads(author_ids):
+    """Newest ``HEAD_SIZE`` (pub_date, id) keys of every author, newest first.
+
+    Served from one cache multi-get; misses are loaded with one window
+    query per ``HEAD_CHUNK`` authors and written back.
+    """
+    keys = {head_key(author_id): author_id for author_id in author_ids}
+    heads = {
+        keys[key]: head for key, head in cache.get_many(keys).items()
+    }
+    missing = [author_id for author_id in author_ids if author_id not in heads]
+    for start in range(0, len(missing), HEAD_CHUNK):
+        loaded = _load_heads(missing[start:start + HEAD_CHUNK])
+        cache.set_many(
+            {head_key(author_id): head for author_id, head in loaded.items()},
+            HEAD_TIMEOUT
+        )
+        heads.update(loaded)
+    return heads
+
+
+def _from_head(head, cursor, older, limit):
+    # The author's keys for the page, or None when the page reaches past
+    # the cached head.
+    if older:
+        keys = [key for key in head if cursor is None or key < cursor]
+        if len(head) < HEAD_SIZE or len(keys) >= limit:
+            return keys
+        return None
+    if len(head) < HEAD_SIZE or head[-1] <= cursor:
+        return [key for key in reversed(head) if key > cursor]
+    return None
+
+
+def _load_streams(author_ids, cursor, older, limit):
+    streams = {}
+    for start in range(0, len(author_ids), HEAD_CHUNK):
+        streams.update(_ranked_keys(
+            author_ids[start:start + HEAD_CHUNK], limit, cursor, older
+        ))
+    return streams
+
+
+class MergeFeedPaginator(CursorPaginator):
+    """Follow feed built by a lazy k-way merge of per-author streams.
+
+    Every followed author contributes a stream of (pub_date, id) keys
+    taken from the cached head. Authors whose head the page reaches past
+    are read from the (author, pub_date) index instead, all of them with
+    one window query per ``HEAD_CHUNK`` authors; heapq merges the
+    streams until one page of ids is collected.
+    """
+
+    def __init__(self, author_ids, per_page):
+        super().__init__(Post.objects.feed(), per_page)
+        self.author_ids = list(author_ids)
+
+    def _fetch(self, after, before):
+        older = before is None
+        cursor = after if older else before
+        limit = self.per_page + 1
+        heads = author_heads(self.author_ids)
+        streams = {
+            author_id: _from_head(heads[author_id], cursor, older, limit)
+            for author_id in self.author_ids
+        }
+        streams.update(_load_streams(
+            [author_id for author_id, keys in streams.items() if keys is None],
+            cursor, older, limit
+        ))
+        keys = list(
+            islice(heapq.merge(*streams.values(), reverse=older), limit)
+        )
+        has_more = len(keys) > self.per_page
+        keys = keys[:self.per_page]
+        posts = self._load([pk for _, pk in keys])
+        items = [posts[pk] for _, pk in keys if pk in posts]
+        if older:
+            return items, after is not None, has_more
+        return items[::-1], has_more, True
+
+    def _load(self, pks):
+        return self.object_list.in_bulk(pks)
+
+
+def cursor_prefix(engine):
+    # The two engines' cursors point at different ids: posts for merge,
+    # timeline entries for timeline.
+    return f'{engine}.'
+
+
+def _cursor_engine(request):
+    for param in ('after', 'before'):
+        engine, dot, _ = request.GET.get(param, '').partition('.')
+        if dot and engine in ENGINES:
+            return engine
+    return None
+
+
+def feed_engine(request):
+    """The engine asked for with ``?engine=``, the one that made the
+    page's cursor, or the one that suits the reader's follow count.
+
+    Going by the cursor keeps a reader who crosses FEED_MERGE_THRESHOLD
+    while scrolling on the engine the scroll started with.
+    """
+    engine = request.GET.get('engine')
+    if engine in ENGINES:
+        return engine
+    engine = _cursor_engine(request)
+    if engine is not None:
+        return engine
+    try:
+        following = request.user.counters.following_count
+    except UserCounters.DoesNotExist:
+        # A user created without the post_save signal, e.g. by
+        # bulk_create, until recount_counters runs.
+        return 'timeline'
+    if following >= settings.FEED_MERGE_THRESHOLD:
+        return 'merge'
+    return 'timeline'
+
+
+def follow_page(request):
+    engine = feed_engine(request)
+    if engine == 'merge':
+        author_ids = Follow.objects.filter(user=request.user).values_list(
+            'author_id', flat=True
+        )
+        paginator = MergeFeedPaginator(author_ids, POSTS_PER_PAGE)
+    else:
+        paginator = CursorPaginator(
+            Post.objects.feed().timeline(request.user),
+            POSTS_PER_PAGE,
+            date_field='timeline_date',
+            id_field='timeline_id'
+        )
+    paginator.cursor_prefix = cursor_prefix(engine)
+    return paginator.get_cursor_page(**cursors(request))
@@ -1,6 +1,8 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm, Textarea
 from django.utils.translation import gettext_lazy as _
 
+from .ingest import ingest
 from .models import Post, Comment
 
 
@@ -16,6 +18,12 @@ class PostForm(ModelForm):
             'text': Textarea(attrs={'placeholder': _('Что нового?')})
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .thumbnails import prefetch
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+ACTIONS_MARKER = '<!-- post-actions -->'
+
+
+def fragment_key(post):
+    # pub_date keeps keys unique if a post id is ever reused; the card
+    # links to the author, so a rename must miss the old fragment.
+    group = f'{post.group_id}.{post.group.version}' if post.group_id else '-'
+    return (
+        f'post:fragment:{post.pk}:{post.pub_date.timestamp()}:'
+        f'{post.version}:{group}:{post.author.username}'
+    )
+
+
+def _actions(post, user):
+    if user is not None and user.is_authenticated \
+            and user.pk == post.author_id:
+        return render_to_string('post_actions.html', {'post': post})
+    return ''
+
+
+def render_posts(posts, user=None):
+    """Render posts from cached, user-independent fragments.
+
+    All fragments of a page are read with one get_many; misses get their
+    thumbnails resolved in one batch, then are rendered and stored with
+    one set_many. Buttons that depend on the viewer are rendered per
+    request into ACTIONS_MARKER.
+    """
+    posts = list(posts)
+    keys = [fragment_key(post) for post in posts]
+    fragments = cache.get_many(keys)
+    prefetch(
+        post for key, post in zip(keys, posts) if key not in fragments
+    )
+    missing = {
+        key: render_to_string('post_item.html', {'post': post})
+        for key, post in zip(keys, posts) if key not in fragments
+    }
+    if missing:
+        cache.set_many(missing, FRAGMENT_TIMEOUT)
+        fragments.update(missing)
+    return ''.join(
+        fragments[key].replace(ACTIONS_MARKER, _actions(post, user))
+        for key, post in zip(keys, posts)
+    )
@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import cache
+
+SITE = 'site'
+INDEX = 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def feed_scope(user_id):
+    return f'feed:{user_id}'
+
+
+def _key(scope):
+    return f'generation:{scope}'
+
+
+def _new():
+    return f'{time.time_ns():x}'
+
+
+def get(scopes):
+    """Current generation of every scope, in order.
+
+    A scope that was never bumped, or whose key was evicted, gets a fresh
+    generation, so nothing cached under an older one can be served.
+    """
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _new(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def timestamp(generation):
+    return int(generation, 16) / 10 ** 9
+
+
+def bump(*scopes):
+    generation = _new()
+    cache.set_many({_key(scope): generation for scope in scopes}, None)
+
+
+def post_scopes(post, group_slug=None):
+    scopes = [INDEX, author_scope(post.author.username)]
+    if group_slug:
+        scopes.append(group_scope(group_slug))
+    return scopes
@@ -0,0 +1,106 @@
+import math
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+# info keys that only carry metadata: camera and GPS data, editor
+# history, comments. The ICC profile is kept, it defines the colours.
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'photoshop', 'comment')
+ORIENTATION = 0x0112
+OUTPUT_FORMAT = 'WEBP'
+OUTPUT_OPTIONS = {'quality': 82, 'method': 4}
+
+
+def _has_metadata(image):
+    return any(key in image.info for key in METADATA_KEYS) or bool(
+        getattr(image, 'text', None)
+    )
+
+
+def _pixels(size):
+    return size[0] * size[1]
+
+
+def _bytes_per_pixel(image):
+    # Pillow keeps every multi-band pixel in 32 bits.
+    return 1 if image.mode in ('1', 'L', 'P') else 4
+
+
+def _too_large():
+    return ValidationError(
+        'Изображение слишком большое: уменьшите его и загрузите снова',
+        code='image_too_large'
+    )
+
+
+def _check_animated(image):
+    # Resizing would drop the animation, so it is stored as uploaded;
+    # frames are only counted from their headers here, but thumbnails
+    # decode them, so all of them must fit in the budget.
+    needed = _pixels(image.size) * 4 * image.n_frames
+    if (max(image.size) > settings.IMAGE_MAX_SIDE
+            or needed > settings.IMAGE_MEMORY_BUDGET):
+        raise _too_large()
+
+
+def ingest(upload):
+    """Store at most IMAGE_MAX_SIDE pixels per side and no metadata.
+
+    Only the header is read to decide: an image that already fits and
+    carries no metadata is stored untouched. Otherwise JPEG is decoded
+    in draft mode straight at the smallest scale that still covers the
+    target. The decoded pixels plus the resized copy must fit in
+    IMAGE_MEMORY_BUDGET, so a huge upload is rejected before it is
+    decoded instead of exhausting the worker. Animated images are kept
+    as they are, metadata included, or rejected when they do not fit.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    max_side = settings.IMAGE_MAX_SIDE
+    oversized = max(image.size) > max_side
+    animated = getattr(image, 'is_animated', False)
+    if animated:
+        _check_animated(image)
+    if animated or not (
+            oversized or _has_metadata(image)):
+        upload.seek(0)
+        return upload
+    scale = min(1, max_side / max(image.size))
+    target = tuple(max(1, math.ceil(side * scale)) for side in image.size)
+    image.draft(image.mode, target)
+    # Palette images are resized in colour, which needs a full copy;
+    # the resized image is copied once more by the encoder.
+    palette = image.mode in ('1', 'P')
+    needed = (
+        _pixels(image.size) * (_bytes_per_pixel(image) + 4 * palette)
+        + _pixels(target) * 4 * 2
+    )
+    if needed > settings.IMAGE_MEMORY_BUDGET:
+        raise _too_large()
+    if palette:
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB'
+        )
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.getexif().get(ORIENTATION, 1) != 1:
+        # Rotating after the resize only copies the small image.
+        image = ImageOps.exif_transpose(image)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    stored = TemporaryUploadedFile(
+        f'{stem}.{OUTPUT_FORMAT.lower()}',
+        Image.MIME[OUTPUT_FORMAT],
+        0,
+        None
+    )
+    image.save(
+        stored,
+        OUTPUT_FORMAT,
+        icc_profile=image.info.get('icc_profile'),
+        **OUTPUT_OPTIONS
+    )
+    stored.size = stored.tell()
+    stored.seek(0)
+    return stored
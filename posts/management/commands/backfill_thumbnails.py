@@ -0,0 +1,41 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import BACKFILL_BATCH_SIZE, GEOMETRIES, backfill
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры всех картинок постов в пуле '
+        'процессов; прерванный запуск продолжается с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument(
+            '--batch-size', type=int, default=BACKFILL_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с первого поста, а не с сохранённого места'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        for totals in backfill(
+                options['workers'], options['batch_size'],
+                options['restart']):
+            self.stdout.write(self.progress(totals, started))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Готово за {elapsed:.1f} с')
+
+    def progress(self, totals, started):
+        elapsed = time.perf_counter() - started
+        rate = totals['done'] / elapsed if elapsed else 0
+        return (
+            f'создано: {totals["done"]}, пропущено: {totals["skipped"]}, '
+            f'ошибок: {totals["failed"]}; {rate:.1f} изобр./с, '
+            f'{rate * len(GEOMETRIES):.1f} миниатюр/с'
+        )
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import format_ms, measure, rolled_back
+from posts.feeds import MergeFeedPaginator, author_heads
+from posts.models import Follow, Post, TimelineEntry, User
+from posts.paginator import POSTS_PER_PAGE, CursorPaginator
+
+BATCH_SIZE = 250
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок на SQL-join, материализованной ленте '
+        'и k-way merge для разного числа авторов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--authors', type=int, nargs='+', default=[10, 1000, 10000]
+        )
+        parser.add_argument('--posts-per-author', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for authors in options['authors']:
+            with rolled_back():
+                reader = self.populate(authors, options['posts_per_author'])
+                self.run(reader, authors, options['repeat'])
+
+    def populate(self, authors, posts_per_author):
+        reader = User.objects.create(username='bench_feed_reader')
+        User.objects.bulk_create(
+            (User(username=f'bench_feed_author_{i}')
+             for i in range(authors)),
+            batch_size=BATCH_SIZE
+        )
+        author_ids = list(
+            User.objects.filter(username__startswith='bench_feed_author_')
+            .values_list('pk', flat=True)
+        )
+        Follow.objects.bulk_create(
+            (Follow(user=reader, author_id=pk) for pk in author_ids),
+            batch_size=BATCH_SIZE
+        )
+        Post.objects.bulk_create(
+            (Post(text=f'bench {i}', author_id=pk)
+             for i in range(posts_per_author) for pk in author_ids),
+            batch_size=BATCH_SIZE
+        )
+        posts = Post.objects.filter(author_id__in=author_ids).values_list(
+            'pk', 'pub_date'
+        )
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user=reader, post_id=pk, pub_date=pub_date)
+             for pk, pub_date in posts.iterator()),
+            batch_size=BATCH_SIZE
+        )
+        return reader
+
+    def run(self, reader, authors, repeat):
+        author_ids = list(
+            Follow.objects.filter(user=reader)
+            .values_list('author_id', flat=True)
+        )
+
+        def joined():
+            list(CursorPaginator(
+                Post.objects.feed().filter(author__following__user=reader),
+                POSTS_PER_PAGE
+            ).get_cursor_page())
+
+        def timeline():
+            list(CursorPaginator(
+                Post.objects.feed().timeline(reader),
+                POSTS_PER_PAGE,
+                date_field='timeline_date',
+                id_field='timeline_id'
+            ).get_cursor_page())
+
+        def merge():
+            list(MergeFeedPaginator(author_ids, POSTS_PER_PAGE)
+                 .get_cursor_page())
+
+        def merge_cold():
+            cache.delete_many([f'feed:head:{pk}' for pk in author_ids])
+            merge()
+
+        author_heads(author_ids)
+        rows = (
+            ('SQL join', joined),
+            ('timeline', timeline),
+            ('merge (холодный кэш)', merge_cold),
+            ('merge (тёплый кэш)', merge),
+        )
+        for name, func in rows:
+            self.stdout.write(
+                f'авторов {authors:>6} {name:<22}'
+                f'{format_ms(measure(func, repeat))}'
+            )
@@ -0,0 +1,155 @@
+import re
+import tempfile
+import uuid
+from html.parser import HTMLParser
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from PIL import Image, ImageFilter
+
+from posts import thumbnails
+from posts.benchmark import rolled_back
+from posts.fragments import render_posts
+from posts.models import Post, User
+
+# name, viewport width and height in CSS pixels, device pixel ratio,
+# WebP support.
+CLIENTS = (
+    ('телефон 360px ×1', 360, 640, 1, True),
+    ('телефон 375px ×2', 375, 667, 2, True),
+    ('телефон 375px ×2, без WebP', 375, 667, 2, False),
+    ('телефон 414px ×3', 414, 896, 3, True),
+    ('планшет 768px ×2', 768, 1024, 2, True),
+    ('ноутбук 1366px ×1', 1366, 768, 1, True),
+    ('монитор 1920px ×1', 1920, 1080, 1, True),
+)
+# Rough height of the navigation and of a card without its image.
+PAGE_TOP = 150
+CARD_BODY = 150
+
+
+class Pictures(HTMLParser):
+    """Collects the candidates of every card image on a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.images = []
+        self.sources = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'picture':
+            self.sources = []
+        elif tag == 'source' and self.sources is not None:
+            self.sources.append((attrs['type'], attrs['srcset']))
+        elif tag == 'img':
+            self.images.append({
+                'sources': self.sources or [],
+                'srcset': attrs.get('srcset', ''),
+                'sizes': attrs.get('sizes', '100vw'),
+                'src': attrs['src'],
+            })
+            self.sources = None
+
+
+def slot_width(sizes, viewport):
+    for entry in sizes.split(', '):
+        condition, _, length = entry.rpartition(' ')
+        if condition and viewport < int(re.search(r'\d+', condition)[0]):
+            continue
+        return viewport if length == '100vw' else int(length[:-2])
+    return viewport
+
+
+def pick(srcset, needed):
+    """The candidate a browser takes for ``needed`` device pixels."""
+    candidates = sorted(
+        (int(width[:-1]), url) for url, width in
+        (candidate.split() for candidate in srcset.split(', '))
+    )
+    for width, url in candidates:
+        if width >= needed:
+            return url
+    return candidates[-1][1]
+
+
+def file_size(url):
+    return default_storage.size(url[len(settings.MEDIA_URL):])
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает байты картинок на странице ленты для разных экранов: '
+        'одна миниатюра 960x339 для всех и варианты из srcset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media), rolled_back():
+            posts = self.populate(options['posts'])
+            parser = Pictures()
+            parser.feed(render_posts(posts))
+            self.report(parser.images)
+
+    def populate(self, total):
+        author = User.objects.create(username='bench_image_bytes_author')
+        prefix = uuid.uuid4().hex[:8]
+        size = (1600, 1200)
+        for i in range(total):
+            # Gradients under soft noise compress roughly like a photo.
+            image = Image.merge('RGB', (
+                Image.linear_gradient('L').resize(size),
+                Image.effect_noise(size, 48 + i).filter(
+                    ImageFilter.GaussianBlur(2)
+                ),
+                Image.radial_gradient('L').resize(size),
+            ))
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=90)
+            post = Post(text=f'bench {i}', author=author)
+            post.image.save(
+                f'bench_{prefix}_{i}.jpg', ContentFile(buffer.getvalue()),
+                save=False
+            )
+            post.save()
+            thumbnails.generate(post.pk, post.image.name)
+        return list(Post.objects.feed().filter(author=author))
+
+    def report(self, images):
+        self.stdout.write(
+            f'{"клиент":<30}{"до, КБ":>10}{"после, КБ":>12}'
+            f'{"первый экран, КБ":>19}'
+        )
+        for name, width, height, ratio, webp in CLIENTS:
+            before = after = initial = 0
+            top = PAGE_TOP
+            for image in images:
+                # Before, every client got the one 960x339 JPEG.
+                before += file_size(image['src'])
+                slot = slot_width(image['sizes'], width)
+                srcset = image['srcset']
+                for mime, source_srcset in image['sources']:
+                    if webp or mime != 'image/webp':
+                        srcset = source_srcset
+                        break
+                size = file_size(
+                    pick(srcset, slot * ratio) if srcset else image['src']
+                )
+                after += size
+                # loading="lazy" leaves cards below the first screen.
+                if top < height:
+                    initial += size
+                top += CARD_BODY + slot * thumbnails.BANNER[1] // (
+                    thumbnails.BANNER[0]
+                )
+            self.stdout.write(
+                f'{name:<30}{before / 1024:>10.1f}{after / 1024:>12.1f}'
+                f'{initial / 1024:>19.1f}'
+            )
@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.benchmark import rolled_back
+from posts.models import Group, Post, User
+
+MIDDLEWARE = 'yatube.metrics.MetricsMiddleware'
+TEMPLATES = 'yatube.metrics.TimedDjangoTemplates'
+
+
+def uninstrumented():
+    return override_settings(
+        MIDDLEWARE=[name for name in settings.MIDDLEWARE
+                    if name != MIDDLEWARE],
+        TEMPLATES=[
+            dict(engine, BACKEND='django.template.backends.django'
+                                 '.DjangoTemplates')
+            if engine['BACKEND'] == TEMPLATES else engine
+            for engine in settings.TEMPLATES
+        ]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность страниц с метриками запросов '
+        'и без них'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--posts', type=int, default=30)
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with rolled_back(), override_settings(PAGE_CACHE_TIMEOUT=0):
+            urls = self.populate(options['posts'])
+            self.run(urls, options['requests'], options['rounds'])
+
+    def populate(self, total):
+        author = User.objects.create(username='bench_metrics_author')
+        group = Group.objects.create(
+            title='bench', slug='bench-metrics-group', description='bench'
+        )
+        post = None
+        for i in range(total):
+            post = Post.objects.create(
+                text=f'bench {i}', author=author, group=group
+            )
+        return (
+            reverse('index'),
+            reverse('group', args=(group.slug,)),
+            reverse('profile', args=(author.username,)),
+            reverse('post', args=(author.username, post.pk)),
+            reverse('api:posts'),
+        )
+
+    def throughput(self, client, urls, requests):
+        cache.clear()
+        for url in urls:
+            client.get(url)
+        started = time.perf_counter()
+        for i in range(requests):
+            client.get(urls[i % len(urls)])
+        return requests / (time.perf_counter() - started)
+
+    def run(self, urls, requests, rounds):
+        client = Client()
+        plain, instrumented = [], []
+        # Alternating rounds spread out drift in the machine's speed.
+        for _ in range(rounds):
+            with uninstrumented():
+                plain.append(self.throughput(client, urls, requests))
+            instrumented.append(self.throughput(client, urls, requests))
+        plain, instrumented = max(plain), max(instrumented)
+        self.stdout.write(f'без метрик: {plain:8.1f} запросов/с')
+        self.stdout.write(f'с метриками: {instrumented:7.1f} запросов/с')
+        self.stdout.write(
+            f'накладные расходы: {(plain / instrumented - 1) * 100:.1f}%'
+        )
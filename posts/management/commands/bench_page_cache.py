@@ -0,0 +1,66 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import page_cache
+from posts.benchmark import rolled_back
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность анонимных страниц '
+        'с кэшем страниц и без него'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            urls = self.populate(options['posts'])
+            self.run(urls, options['requests'])
+
+    def populate(self, total):
+        author = User.objects.create(username='bench_page_author')
+        group = Group.objects.create(
+            title='bench', slug='bench-page-group', description='bench'
+        )
+        post = None
+        for i in range(total):
+            post = Post.objects.create(
+                text=f'bench {i}', author=author, group=group
+            )
+        return (
+            reverse('index'),
+            reverse('group', kwargs={'slug': group.slug}),
+            reverse('profile', kwargs={'username': author.username}),
+            reverse('post', kwargs={
+                'username': author.username, 'post_id': post.pk
+            }),
+        )
+
+    def throughput(self, client, urls, requests):
+        started = time.perf_counter()
+        for i in range(requests):
+            client.get(urls[i % len(urls)])
+        return requests / (time.perf_counter() - started)
+
+    def run(self, urls, requests):
+        client = Client()
+        cache.clear()
+        with override_settings(PAGE_CACHE_TIMEOUT=0):
+            uncached = self.throughput(client, urls, requests)
+        before = page_cache.stats()
+        cached = self.throughput(client, urls, requests)
+        after = page_cache.stats()
+        self.stdout.write(f'без кэша: {uncached:8.1f} запросов/с')
+        self.stdout.write(f'с кэшем:  {cached:8.1f} запросов/с')
+        self.stdout.write(
+            f'попаданий: {after["hits"] - before["hits"]}, '
+            f'промахов: {after["misses"] - before["misses"]}'
+        )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from posts.benchmark import format_ms, measure, rolled_back
+from posts.models import Post, User
+from posts.paginator import POSTS_PER_PAGE, CursorPaginator, encode_cursor
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время отдачи первой и глубокой страницы ленты '
+        'для Paginator и CursorPaginator'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+        with rolled_back():
+            self.populate(pages * POSTS_PER_PAGE, options['batch_size'])
+            self.run(pages, options['repeat'])
+
+    def populate(self, total, batch_size):
+        author = User.objects.create(username='bench_pagination_author')
+        for start in range(0, total, batch_size):
+            Post.objects.bulk_create(
+                Post(text=f'bench {i}', author=author)
+                for i in range(start, min(start + batch_size, total))
+            )
+        self.stdout.write(f'Создано постов: {total}')
+
+    def run(self, pages, repeat):
+        queryset = Post.objects.all()
+        offset = (pages - 1) * POSTS_PER_PAGE
+        deep_cursor = None
+        if offset:
+            # The last post of the page before the deep one.
+            anchor = queryset.order_by('-pub_date', '-id')[offset - 1]
+            deep_cursor = encode_cursor(anchor.pub_date, anchor.pk)
+
+        def offset_page(number):
+            return lambda: list(
+                Paginator(queryset, POSTS_PER_PAGE).get_page(number)
+            )
+
+        def cursor_page(after):
+            return lambda: list(
+                CursorPaginator(queryset, POSTS_PER_PAGE)
+                .get_cursor_page(after=after)
+            )
+
+        rows = (
+            ('Paginator', 1, offset_page(1)),
+            ('Paginator', pages, offset_page(pages)),
+            ('CursorPaginator', 1, cursor_page(None)),
+            ('CursorPaginator', pages, cursor_page(deep_cursor)),
+        )
+        for name, number, func in rows:
+            self.stdout.write(
+                f'{name:<16} страница {number:>6}: '
+                f'{format_ms(measure(func, repeat))}'
+            )
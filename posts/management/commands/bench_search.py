@@ -0,0 +1,77 @@
+import random
+import string
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import format_ms, measure, rolled_back
+from posts.models import Post, User
+from posts.paginator import POSTS_PER_PAGE
+from posts.search import SearchPaginator, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по FTS5-индексу с поиском '
+        'через icontains для частого, редкого и отсутствующего слова'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--words', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        vocabulary = self.vocabulary(options['words'])
+        with rolled_back():
+            self.populate(options['posts'], vocabulary, options['batch_size'])
+            self.run(vocabulary, options['repeat'])
+
+    def vocabulary(self, size):
+        generator = random.Random(0)
+        return [
+            ''.join(generator.choices(string.ascii_lowercase, k=8))
+            for _ in range(size)
+        ]
+
+    def populate(self, total, vocabulary, batch_size):
+        generator = random.Random(1)
+        # Zipf-like: the first words are far more frequent than the last.
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        author = User.objects.create(username='bench_search_author')
+        for start in range(0, total, batch_size):
+            Post.objects.bulk_create(
+                Post(
+                    text=' '.join(generator.choices(
+                        vocabulary, weights, k=30
+                    )),
+                    author=author
+                )
+                for _ in range(start, min(start + batch_size, total))
+            )
+        self.stdout.write(f'Проиндексировано постов: {rebuild()}')
+
+    def run(self, vocabulary, repeat):
+        def scan(word):
+            return lambda: list(
+                Post.objects.filter(text__icontains=word)
+                .order_by('-pub_date')[:POSTS_PER_PAGE]
+            )
+
+        def fts(word):
+            return lambda: list(
+                SearchPaginator(word, POSTS_PER_PAGE).get_cursor_page()
+            )
+
+        words = (
+            ('частое', vocabulary[0]),
+            ('редкое', vocabulary[-1]),
+            ('нет в базе', 'отсутствует'),
+        )
+        for label, word in words:
+            for name, func in (('icontains', scan(word)),
+                               ('FTS5', fts(word))):
+                self.stdout.write(
+                    f'{label:<11}{name:<10}'
+                    f'{format_ms(measure(func, repeat))}'
+                )
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from functools import partial
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from yatube.cache import SQLiteCache, memoize
+
+
+def _naive(cache, key, compute, timeout, fallback_key):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def _single_flight(cache, key, compute, timeout, fallback_key):
+    return memoize(key, compute, timeout, fallback_key=fallback_key,
+                   cache=cache)
+
+
+def _worker(make_cache, lookup, barrier, counters, rounds, keys, cost):
+    cache = make_cache()
+
+    def compute():
+        with counters['recomputes'].get_lock():
+            counters['recomputes'].value += 1
+        time.sleep(cost)
+        return 'x' * 1024
+
+    for generation in range(rounds):
+        # Every round starts right after an invalidation, all processes
+        # asking for the same keys at once.
+        barrier.wait()
+        for i in range(keys):
+            lookup(cache, f'bench:{generation}:{i}', compute, 60,
+                   f'bench:last:{i}')
+            with counters['requests'].get_lock():
+                counters['requests'].value += 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Гоняет несколько процессов по одним ключам сразу после '
+        'инвалидации и считает долю попаданий и число пересчётов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--keys', type=int, default=10)
+        parser.add_argument(
+            '--cost', type=float, default=0.02,
+            help='Время одного пересчёта, секунды'
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, 'bench.sqlite3')
+            rows = (
+                ('locmem, get/set', partial(LocMemCache, 'bench', {}),
+                 _naive),
+                ('sqlite, get/set',
+                 partial(SQLiteCache, location, {'KEY_PREFIX': 'naive'}),
+                 _naive),
+                ('sqlite, single-flight',
+                 partial(SQLiteCache, location, {'KEY_PREFIX': 'memoize'}),
+                 _single_flight),
+            )
+            for name, make_cache, lookup in rows:
+                self.run(name, make_cache, lookup, options)
+
+    def run(self, name, make_cache, lookup, options):
+        context = multiprocessing.get_context('fork')
+        processes = options['processes']
+        counters = {
+            'requests': context.Value('i', 0),
+            'recomputes': context.Value('i', 0),
+        }
+        barrier = context.Barrier(processes)
+        workers = [
+            context.Process(target=_worker, args=(
+                make_cache, lookup, barrier, counters, options['rounds'],
+                options['keys'], options['cost']
+            ))
+            for _ in range(processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        requests = counters['requests'].value
+        recomputes = counters['recomputes'].value
+        self.stdout.write(
+            f'{name:<24} запросов {requests:>6}  пересчётов {recomputes:>5}  '
+            f'попаданий {1 - recomputes / requests:>6.1%}  '
+            f'{elapsed:.2f} с'
+        )
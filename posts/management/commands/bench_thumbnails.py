@@ -0,0 +1,100 @@
+import tempfile
+import time
+import uuid
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts import thumbnails
+from posts.benchmark import format_ms, rolled_back
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск готовых миниатюр для страницы с картинками: '
+        'по одной через sorl и одним пакетом'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media), rolled_back():
+            posts = self.populate(options['posts'])
+            self.run(posts, options['repeat'])
+
+    def populate(self, total):
+        author = User.objects.create(username='bench_thumbnails_author')
+        prefix = uuid.uuid4().hex[:8]
+        posts = []
+        for i in range(total):
+            buffer = BytesIO()
+            Image.new('RGB', (1600, 1200), (i % 256, 80, 160)).save(
+                buffer, 'JPEG'
+            )
+            post = Post(text=f'bench {i}', author=author)
+            post.image.save(
+                f'bench_{prefix}_{i}.jpg', ContentFile(buffer.getvalue()),
+                save=False
+            )
+            post.save()
+            thumbnails.generate(post.pk, post.image.name)
+            posts.append(post)
+        return list(Post.objects.feed().filter(author=author))
+
+    def run(self, posts, repeat):
+        geometry, geometry_options = thumbnails.GEOMETRIES[0]
+        raw_keys = [
+            add_prefix(thumbnails.backend.thumbnail_file(
+                post.image, geometry, **geometry_options
+            ).key)
+            for post in posts
+        ]
+
+        def drop_cache():
+            default.kvstore.cache.delete_many(raw_keys)
+            drop_lru()
+
+        def drop_lru():
+            thumbnails._lru.clear()
+
+        def one_by_one():
+            # What {% thumbnail %} does for every image it renders.
+            for post in posts:
+                get_thumbnail(post.image, geometry, **geometry_options)
+
+        def batched():
+            thumbnails.prefetch(posts)
+            for post in posts:
+                thumbnails.post_thumbnail(post, geometry, **geometry_options)
+
+        rows = (
+            ('sorl по одному, пустой кэш', drop_cache, one_by_one),
+            ('sorl по одному, тёплый кэш', None, one_by_one),
+            ('пакетом, пустой кэш', drop_cache, batched),
+            ('пакетом, тёплый кэш', drop_lru, batched),
+            ('пакетом, LRU', None, batched),
+        )
+        for name, prepare, func in rows:
+            timings = []
+            for _ in range(repeat):
+                if prepare:
+                    prepare()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write(
+                f'{name:<28}{format_ms(timings[len(timings) // 2])}  '
+                f'запросов к БД: {len(queries)}'
+            )
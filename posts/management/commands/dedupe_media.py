@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит уже загруженные картинки постов в хранилище по хешу '
+        'содержимого, храня одинаковые файлы один раз'
+    )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        files = adopted = freed = 0
+        # os.walk lists one directory at a time, so the pass streams.
+        for directory, _, names in os.walk(storage.path(field.upload_to)):
+            for filename in names:
+                name = os.path.relpath(
+                    os.path.join(directory, filename), storage.location
+                )
+                files += 1
+                if os.path.islink(storage.path(name)):
+                    continue
+                freed += storage.adopt(name)
+                adopted += 1
+        self.stdout.write(
+            f'Файлов: {files}, перенесено: {adopted}, '
+            f'освобождено: {freed / 2 ** 20:.1f} МБ'
+        )
+        if adopted:
+            self.stdout.write(
+                'Миниатюры теперь общие для одинаковых картинок: '
+                'создайте их командой backfill_thumbnails'
+            )
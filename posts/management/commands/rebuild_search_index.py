@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import SEARCH_BATCH_SIZE, enabled, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SEARCH_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if not enabled():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        total = rebuild(options['batch_size'])
+        self.stdout.write(f'Постов в индексе: {total}')
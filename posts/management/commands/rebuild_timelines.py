@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import FAN_OUT_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок всех пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=FAN_OUT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild(options['batch_size'])
+        self.stdout.write(f'Записей в лентах: {total}')
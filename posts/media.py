@@ -0,0 +1,186 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from .storage import BLOB_DIR, media_storage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class Unsatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """``length`` bytes of an open file from its current position.
+
+    Keeps ``fileno()``, so a ``wsgi.file_wrapper`` can still sendfile()
+    the part; Content-Length tells it where to stop.
+    """
+
+    def __init__(self, file_, length):
+        self.file = file_
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def allowed(name):
+    """Whether ``name`` may be served: the blob store and dotfiles never
+    are, everything else under MEDIA_ROOT is public."""
+    parts = name.split('/')
+    return parts[0] != BLOB_DIR and not any(
+        part.startswith('.') for part in parts
+    )
+
+
+def byte_range(header, size):
+    """The (first, last) byte of a single Range header.
+
+    None means the whole file: no header, a malformed one or several
+    ranges, which the spec lets a server ignore.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        if int(last) == 0:
+            raise Unsatisfiable
+        return max(0, size - int(last)), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise Unsatisfiable
+    last = int(last) if last else size - 1
+    return first, min(last, size - 1)
+
+
+def _etag(name, status):
+    # The content hash when the name is in the content-addressed store;
+    # otherwise the inode, mtime and size, like nginx and Apache.
+    digest = media_storage.content_hash(name)
+    if digest is None:
+        digest = f'{status.st_ino:x}-{status.st_mtime_ns:x}-{status.st_size:x}'
+    return f'"{digest}"'
+
+
+def _cache_control(name):
+    # Names are never reused for other content: uploads get a free name
+    # and thumbnail names derive from their source and options.
+    value = f'public, max-age={settings.MEDIA_CACHE_TIMEOUT}'
+    if name.startswith(thumbnail_settings.THUMBNAIL_PREFIX):
+        value += ', immutable'
+    return value
+
+
+@require_safe
+def serve(request, path):
+    """Send a file from MEDIA_ROOT with validators and byte ranges.
+
+    By default the bytes are handed to the front server, which serves
+    them with its own sendfile and Range handling, e.g. for nginx:
+
+        location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+
+    With MEDIA_OFFLOAD = None they are streamed by FileResponse, which
+    lets the WSGI server's ``wsgi.file_wrapper`` use sendfile().
+    """
+    name = path.lstrip('/')
+    if not allowed(name):
+        raise Http404
+    try:
+        full_path = media_storage.path(name)
+        status = os.stat(full_path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404
+    etag = _etag(name, status)
+    last_modified = int(status.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': _cache_control(name),
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _send(request, name, full_path, status.st_size, headers)
+    if response.status_code in (200, 206, 304):
+        for header, value in headers.items():
+            response.setdefault(header, value)
+    return response
+
+
+def _send(request, name, full_path, size, validators):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    offload = settings.MEDIA_OFFLOAD
+    if offload == 'X-Accel-Redirect':
+        response = HttpResponse(content_type=content_type)
+        response[offload] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        return response
+    if offload == 'X-Sendfile':
+        response = HttpResponse(content_type=content_type)
+        response[offload] = full_path
+        return response
+    try:
+        first, last = (
+            _range_for(request, size, validators) or (0, size - 1)
+        )
+    except Unsatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    length = last - first + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        file_ = open(full_path, 'rb')
+        file_.seek(first)
+        response = FileResponse(
+            FileRange(file_, length), content_type=content_type
+        )
+    if length != size:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    response['Content-Length'] = length
+    return response
+
+
+def _range_for(request, size, validators):
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # A range of a file that changed since the client's copy would
+    # corrupt it: then the whole file is sent.
+    if if_range and if_range not in (
+            validators['ETag'], validators['Last-Modified']):
+        return None
+    return byte_range(header, size)
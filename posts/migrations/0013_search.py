@@ -0,0 +1,36 @@
+from django.db import migrations
+
+CREATE = (
+    "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+    "text, author, group_title, tokenize='unicode61 remove_diacritics 2')"
+)
+FILL = (
+    "INSERT INTO posts_post_search (rowid, text, author, group_title) "
+    "SELECT p.id, p.text, u.username, COALESCE(g.title, '') "
+    "FROM posts_post p JOIN auth_user u ON u.id = p.author_id "
+    "LEFT JOIN posts_group g ON g.id = p.group_id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE)
+    schema_editor.execute(FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,10 +1,31 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import media_storage
+
 User = get_user_model()
 
 
-class Group(models.Model):
+class CounterFieldsMixin:
+    """Leaves COUNTER_FIELDS out of a plain save() of an existing row.
+
+    They are maintained with F() updates, so the in-memory values may be
+    stale and must not be written back.
+    """
+
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CounterFieldsMixin, models.Model):
     title = models.CharField(
         max_length=200,
         verbose_name='Название группы:',
@@ -19,12 +40,45 @@ class Group(models.Model):
         verbose_name='Описание группы:',
         help_text='Введите описание группы'
     )
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+
+    # Bumped by posts.signals after every save.
+    COUNTER_FIELDS = ('version',)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'placeholder',
+        'comments_count',
+        'version',
+        'author__username',
+        'group__slug',
+        'group__title',
+        'group__version',
+    )
+
+    def feed(self):
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+    def timeline(self, user):
+        # Keyed on the entry columns so the page is read straight off
+        # the (user, pub_date) index; see posts.timeline.
+        return self.filter(timeline_entries__user=user).annotate(
+            timeline_date=models.F('timeline_entries__pub_date'),
+            timeline_id=models.F('timeline_entries__id'),
+        )
+
+
+class Post(CounterFieldsMixin, models.Model):
     text = models.TextField(
         verbose_name='Текст:',
         help_text='Введите текст'
@@ -49,17 +103,51 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=media_storage,
         blank=True,
         null=True,
         verbose_name='Изображение:',
         help_text='Выберите файл'
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    # A tiny blurred data: URI of the image, set by posts.thumbnails.
+    placeholder = models.TextField(
+        blank=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Counters are maintained with F() updates by posts.signals and the
+    # placeholder by posts.thumbnails; a plain save() of an existing post
+    # must not write back a stale value.
+    COUNTER_FIELDS = ('comments_count', 'version', 'placeholder')
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ('-pub_date',)
+        # Ascending on purpose: SQLite walks them backwards, and the
+        # implicit rowid tail then matches ORDER BY pub_date DESC, id DESC.
+        indexes = (
+            models.Index(fields=('pub_date',), name='post_date_idx'),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_date_idx'
+            ),
+        )
 
 
 class Comment(models.Model):
@@ -87,6 +175,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx'
+            ),
+        )
 
 
 class Follow(models.Model):
@@ -100,3 +194,67 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow'
+            ),
+        )
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date'),
+                name='timeline_user_date_idx'
+            ),
+        )
+
+
+# Content stored once by posts.storage and how many names use it.
+class MediaBlob(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.digest
@@ -0,0 +1,127 @@
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from yatube.cache import memoize
+
+from . import generations
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+def _path_hash(request):
+    return hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+
+def page_key(request, scopes):
+    parts = generations.get([generations.SITE] + scopes)
+    return f'page:{".".join(parts)}:{_path_hash(request)}'
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.cookies
+
+
+def _mark_stale(response):
+    # A stale copy must not be revalidated under the fresh generations.
+    response['ETag'] = f'"stale-{id(response):x}"'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cache_anonymous_page(scopes):
+    """Cache whole responses for anonymous GET requests.
+
+    ``scopes`` maps the request and view kwargs to the generation scopes
+    the page depends on; the key embeds their current generations, so a
+    bump from posts.signals retires every page of that scope at once.
+    After a bump one process re-renders the page while the others keep
+    serving the previous copy of the same URL.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if (not timeout or request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            rendered = []
+
+            def render():
+                rendered.append(True)
+                return view(request, *args, **kwargs)
+
+            response = memoize(
+                page_key(request, scopes(request, **kwargs)),
+                render,
+                timeout,
+                fallback_key=f'page:last:{_path_hash(request)}',
+                cacheable=_cacheable,
+                on_stale=_mark_stale
+            )
+            _count('misses' if rendered else 'hits')
+            return response
+        return wrapper
+    return decorator
+
+
+def _viewer(request):
+    # Logging in again rotates the session and the CSRF secret without
+    # bumping a generation; a page with a dead csrf_token must not 304.
+    if not request.user.is_authenticated:
+        return '-'
+    return ':'.join((
+        str(request.user.pk),
+        request.session.session_key or '',
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    ))
+
+
+def _validators(request, scopes, kwargs):
+    if not hasattr(request, '_page_validators'):
+        parts = generations.get([generations.SITE] + scopes(request, **kwargs))
+        etag = hashlib.md5(
+            f'{_viewer(request)}:{request.get_full_path()}:'
+            f'{".".join(parts)}'.encode()
+        ).hexdigest()
+        modified = None
+        if not request.user.is_authenticated:
+            modified = datetime.fromtimestamp(
+                max(map(generations.timestamp, parts)), tz=timezone.utc
+            )
+        request._page_validators = (etag, modified)
+    return request._page_validators
+
+
+def conditional_page(scopes):
+    """Answer If-None-Match/If-Modified-Since from generations alone.
+
+    The validators come from the same scopes as the page cache plus the
+    viewer, so a 304 costs a cache read and never touches the feed.
+    Logged-in pages get no Last-Modified: a date cannot tell two
+    sessions apart, only the ETag can.
+    """
+    return condition(
+        etag_func=lambda request, *args, **kwargs: _validators(
+            request, scopes, kwargs
+        )[0],
+        last_modified_func=lambda request, *args, **kwargs: _validators(
+            request, scopes, kwargs
+        )[1],
+    )
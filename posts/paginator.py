@@ -0,0 +1,178 @@
+import base64
+import binascii
+import hashlib
+
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from yatube.cache import memoize
+
+POSTS_PER_PAGE = 10
+EXACT_COUNT_LIMIT = 10000
+COUNT_TIMEOUT = 60 * 10
+
+
+def encode_cursor(date, pk):
+    raw = f'{date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, pk = raw.decode().split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+def keyset_filter(queryset, cursor, older, date_field='pub_date',
+                  id_field='id'):
+    date, pk = cursor
+    if older:
+        bound = Q(**{f'{date_field}__lte': date}) & ~Q(
+            **{date_field: date, f'{id_field}__gte': pk}
+        )
+    else:
+        bound = Q(**{f'{date_field}__gte': date}) & ~Q(
+            **{date_field: date, f'{id_field}__lte': pk}
+        )
+    return queryset.filter(bound)
+
+
+class CursorPaginator(Paginator):
+    """Keyset pagination over ``(date_field, id_field)``, newest first.
+
+    Pages are addressed by opaque ``after``/``before`` tokens instead of
+    numbers, so no page needs ``COUNT(*)`` or ``OFFSET``. The returned
+    object is a regular ``Page``: ``number`` and ``num_pages`` are only
+    filled in far enough for ``has_next``/``has_previous`` to work.
+    Cursors start with ``cursor_prefix``; one without it is ignored.
+    """
+
+    cursor_prefix = ''
+
+    def __init__(self, object_list, per_page,
+                 date_field='pub_date', id_field='id'):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.id_field = id_field
+
+    def _seek(self, cursor, older):
+        return keyset_filter(
+            self.object_list, cursor, older, self.date_field, self.id_field
+        )
+
+    def _fetch(self, after, before):
+        desc = (f'-{self.date_field}', f'-{self.id_field}')
+        asc = (self.date_field, self.id_field)
+        limit = self.per_page + 1
+        if before is not None:
+            newer = self._seek(before, older=False).order_by(*asc)
+            items = list(newer[:limit])
+            has_previous = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            return items, has_previous, True
+        queryset = self.object_list
+        if after is not None:
+            queryset = self._seek(after, older=True)
+        items = list(queryset.order_by(*desc)[:limit])
+        has_next = len(items) > self.per_page
+        return items[:self.per_page], after is not None, has_next
+
+    def _decode(self, token):
+        if not token or not token.startswith(self.cursor_prefix):
+            return None
+        return decode_cursor(token[len(self.cursor_prefix):])
+
+    def _key(self, item):
+        return getattr(item, self.date_field), getattr(item, self.id_field)
+
+    def _cursor(self, item):
+        return self.cursor_prefix + encode_cursor(*self._key(item))
+
+    def get_cursor_page(self, after=None, before=None):
+        after, before = self._decode(after), self._decode(before)
+        items, has_previous, has_next = self._fetch(after, before)
+        if not items:
+            has_previous = has_next = False
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        page = Page(items, number, self)
+        page.next_cursor = self._cursor(items[-1]) if has_next else None
+        page.previous_cursor = self._cursor(items[0]) if has_previous else None
+        return page
+
+
+def cursors(request):
+    """The ``after`` and ``before`` cursors of the request.
+
+    Pages used to be numbered; an old ``?page=N`` link past the first
+    page is answered 404 rather than with the first page under its URL.
+    """
+    if request.GET.get('page', '1') != '1':
+        raise Http404('Страницы теперь открываются по ссылкам «Следующая»')
+    return {
+        'after': request.GET.get('after'),
+        'before': request.GET.get('before'),
+    }
+
+
+def paginate(request, object_list, **kwargs):
+    paginator = CursorPaginator(object_list, POSTS_PER_PAGE, **kwargs)
+    return paginator.get_cursor_page(**cursors(request))
+
+
+def estimate_rows(model, using='default'):
+    """Table size from the planner statistics, or None without them."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        # Filled in by ANALYZE; the first number is the row count.
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    return int(str(row[0]).split()[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for admin changelists over very large tables.
+
+    Counts are exact up to ``EXACT_COUNT_LIMIT`` rows and are read with a
+    bounded ``COUNT`` over a ``LIMIT`` subquery. Above that, an unfiltered
+    list uses the planner's row estimate, and a filtered one uses an
+    exact count that is cached for ``COUNT_TIMEOUT`` seconds.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        bounded = queryset[:EXACT_COUNT_LIMIT + 1].count()
+        if bounded <= EXACT_COUNT_LIMIT:
+            return bounded
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None:
+                return max(estimate, bounded)
+        key = hashlib.md5(str(queryset.query).encode()).hexdigest()
+        return memoize(f'count:{key}', queryset.count, COUNT_TIMEOUT)
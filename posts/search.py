@@ -0,0 +1,180 @@
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .counters import _ranges
+from .models import Group, Post, User
+from .paginator import POSTS_PER_PAGE, CursorPaginator, cursors, paginate
+
+TABLE = 'posts_post_search'
+SEARCH_BATCH_SIZE = 5000
+# bm25 weights of the text, author and group_title columns.
+WEIGHTS = (10.0, 2.0, 2.0)
+
+_INSERT = (
+    f'INSERT INTO {TABLE} (rowid, text, author, group_title) '
+    f'SELECT p.id, p.text, u.username, COALESCE(g.title, \'\') '
+    f'FROM {Post._meta.db_table} p '
+    f'JOIN {User._meta.db_table} u ON u.id = p.author_id '
+    f'LEFT JOIN {Group._meta.db_table} g ON g.id = p.group_id '
+)
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    # Every word becomes a quoted prefix term, so user input can never
+    # be parsed as FTS5 query syntax.
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+
+def index_post(post_id):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(_INSERT + 'WHERE p.id = %s', [post_id])
+
+
+def remove_posts(post_ids):
+    if not enabled() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})',
+            list(post_ids)
+        )
+
+
+def _update_column(column, value, fk, pk):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET {column} = %s WHERE rowid IN '
+            f'(SELECT id FROM {Post._meta.db_table} WHERE {fk} = %s)',
+            [value, pk]
+        )
+
+
+def retitle_posts(post_ids, title):
+    if not enabled() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET group_title = %s '
+            f'WHERE rowid IN ({placeholders})',
+            [title, *post_ids]
+        )
+
+
+def rename_author(user_id, username):
+    _update_column('author', username, 'author_id', user_id)
+
+
+def retitle_group(group_id, title):
+    _update_column('group_title', title, 'group_id', group_id)
+
+
+def rebuild(batch_size=SEARCH_BATCH_SIZE):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for low, high in _ranges(Post.objects, batch_size):
+            cursor.execute(_INSERT + 'WHERE p.id BETWEEN %s AND %s',
+                           [low, high])
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def search_filter(queryset, query):
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        (match_expression(query),)
+    ))
+
+
+def encode_cursor(score, pk):
+    raw = f'{score!r}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        score, pk = raw.decode().split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset pagination over bm25 relevance, best match first.
+
+    Pages are cut on ``(score, rowid)`` straight in the FTS5 query, so
+    only one page of post ids leaves SQLite; the posts themselves come
+    from one ``in_bulk`` on the feed queryset.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__(Post.objects.feed(), per_page)
+        self.match = match_expression(query)
+
+    def _decode(self, token):
+        return decode_cursor(token)
+
+    def _cursor(self, item):
+        return encode_cursor(item.search_score, item.pk)
+
+    def _ranked(self, cursor, worse):
+        bound, params = '', []
+        if cursor is not None:
+            op = '>' if worse else '<'
+            bound = f'WHERE score {op} %s OR (score = %s AND id {op} %s)'
+            params = [cursor[0], cursor[0], cursor[1]]
+        order = 'ASC' if worse else 'DESC'
+        weights = ', '.join(map(str, WEIGHTS))
+        with connection.cursor() as db:
+            db.execute(
+                f'SELECT id, score FROM ('
+                f'SELECT rowid AS id, bm25({TABLE}, {weights}) AS score '
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s) {bound} '
+                f'ORDER BY score {order}, id {order} LIMIT %s',
+                [self.match, *params, self.per_page + 1]
+            )
+            return db.fetchall()
+
+    def _fetch(self, after, before):
+        if not self.match:
+            return [], False, False
+        worse = before is None
+        rows = self._ranked(after if worse else before, worse)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        posts = self.object_list.in_bulk([pk for pk, _ in rows])
+        items = []
+        for pk, score in rows:
+            if pk in posts:
+                posts[pk].search_score = score
+                items.append(posts[pk])
+        if worse:
+            return items, after is not None, has_more
+        return items[::-1], has_more, True
+
+
+def search_page(request, query):
+    if not enabled():
+        return paginate(
+            request, Post.objects.feed().filter(text__icontains=query)
+        )
+    paginator = SearchPaginator(query, POSTS_PER_PAGE)
+    return paginator.get_cursor_page(**cursors(request))
@@ -0,0 +1,189 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from jobs.queue import defer
+
+from . import generations, search
+from .bulk import forget_posts
+from .counters import bump_group, bump_post, bump_user
+from .feeds import invalidate_head
+from .models import Comment, Follow, Group, Post, User, UserCounters
+from .storage import release
+
+
+def bump_post_pages(post, previous_group_slug=None):
+    if post is None:
+        return
+    scopes = generations.post_scopes(
+        post, post.group.slug if post.group_id else None
+    )
+    if previous_group_slug:
+        scopes.append(generations.group_scope(previous_group_slug))
+    generations.bump(*scopes)
+
+
+def bump_comment_pages(comment):
+    bump_post_pages(
+        Post.objects.select_related('author', 'group')
+        .filter(pk=comment.post_id).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def bump_user_pages(sender, instance, created, raw=False,
+                    update_fields=None, **kwargs):
+    if raw or update_fields == frozenset(('last_login',)):
+        return
+    if created:
+        generations.bump(generations.author_scope(instance.username))
+    else:
+        generations.bump(generations.SITE)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if not instance.pk or raw:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        instance._previous_username = instance.username
+        return
+    instance._previous_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def rename_search_author(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_username', None)
+    if created or raw or previous == instance.username:
+        return
+    search.rename_author(instance.pk, instance.username)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_site_pages(sender, raw=False, **kwargs):
+    if not raw:
+        generations.bump(generations.SITE)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_group_slug, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group__slug', 'image').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if not raw and previous and previous != instance.image.name:
+        transaction.on_commit(partial(release, [previous]))
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_post_pages(instance, getattr(instance, '_previous_group_slug', None))
+    if not created:
+        bump_post(instance.pk)
+        return
+    bump_user(instance.author_id, posts_count=1)
+    invalidate_head(instance.author_id)
+    defer('posts.fan_out', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def bump_group_version(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_group(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def retitle_search_group(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.retitle_group(instance.pk, instance.title)
+
+
+@receiver(pre_delete, sender=Group)
+def untitle_search_group(sender, instance, **kwargs):
+    search.retitle_group(instance.pk, '')
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    forget_posts([(
+        instance.pk,
+        instance.author_id,
+        instance.author.username,
+        instance.group.slug if instance.group_id else None,
+        instance.image.name
+    )])
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_post(instance.post_id, 1)
+        bump_comment_pages(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump_post(instance.post_id, -1)
+    bump_comment_pages(instance)
+
+
+def bump_follow_pages(follow):
+    usernames = User.objects.filter(
+        pk__in=(follow.user_id, follow.author_id)
+    ).values_list('username', flat=True)
+    generations.bump(
+        generations.feed_scope(follow.user_id),
+        *map(generations.author_scope, usernames)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user(instance.user_id, following_count=1)
+        bump_user(instance.author_id, followers_count=1)
+        bump_follow_pages(instance)
+        defer(
+            'posts.follow',
+            user_id=instance.user_id, author_id=instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_user(instance.user_id, following_count=-1)
+    bump_user(instance.author_id, followers_count=-1)
+    bump_follow_pages(instance)
+    defer(
+        'posts.unfollow',
+        user_id=instance.user_id, author_id=instance.author_id
+    )
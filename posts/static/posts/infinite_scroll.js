@@ -0,0 +1,48 @@
+// Appends the next page of post cards when the reader nears the end of
+// the list. The cards come from a partials/ URL and the cursor of the
+// page after them from its X-Next-Cursor header. Without JavaScript
+// the pagination links below the list work as before.
+(function () {
+  var sentinel = document.querySelector('.js-infinite-scroll');
+  if (!sentinel || !window.fetch || !window.IntersectionObserver) {
+    return;
+  }
+  var pagination = document.querySelector('.pagination');
+  if (pagination) {
+    pagination.style.display = 'none';
+  }
+  var loading = false;
+  var observer = new IntersectionObserver(function (entries) {
+    if (loading || !entries[0].isIntersecting) {
+      return;
+    }
+    loading = true;
+    // data-url ends in '?' or '&': it carries the page's own
+    // parameters, such as engine=, for the partial to match the page.
+    var url = sentinel.dataset.url + 'after=' +
+      encodeURIComponent(sentinel.dataset.next);
+    fetch(url, {credentials: 'same-origin'}).then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      var next = response.headers.get('X-Next-Cursor');
+      return response.text().then(function (html) {
+        sentinel.insertAdjacentHTML('beforebegin', html);
+        if (next) {
+          sentinel.dataset.next = next;
+          loading = false;
+        } else {
+          observer.disconnect();
+          sentinel.remove();
+        }
+      });
+    }).catch(function () {
+      // Leave the links for the reader to page on by hand.
+      observer.disconnect();
+      if (pagination) {
+        pagination.style.display = '';
+      }
+    });
+  }, {rootMargin: '800px 0px'});
+  observer.observe(sentinel);
+})();
@@ -0,0 +1,145 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+def _blobs():
+    # Looked up lazily: models.py imports this module for Post.image.
+    return apps.get_model('posts', 'MediaBlob').objects
+
+
+def _posts():
+    return apps.get_model('posts', 'Post').objects
+
+
+def _digest(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Keeps the bytes of identical uploads once.
+
+    Content lives under BLOB_DIR named by its SHA-256. A file is saved
+    under its usual name as a relative symlink to the blob, so names,
+    URLs and ``upload_to`` behave as before. MediaBlob counts the names
+    pointing at each blob; the blob is deleted with its last name.
+    """
+
+    def blob_name(self, digest):
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}'
+
+    def content_hash(self, name):
+        """The SHA-256 behind ``name``, or None for a plain file."""
+        try:
+            target = os.readlink(self.path(name))
+        except (OSError, ValueError, SuspiciousFileOperation):
+            return None
+        return os.path.basename(target)
+
+    def exists(self, name):
+        # A dangling link still holds its name.
+        return os.path.lexists(self.path(name))
+
+    def _save(self, name, content):
+        digest = _digest(content.chunks())
+        blob = self.blob_name(digest)
+        if not os.path.exists(self.path(blob)):
+            stored = super()._save(blob, content)
+            if stored != blob:
+                # The same content was stored concurrently.
+                super().delete(stored)
+        name = self._link(name, blob)
+        self._reference(digest, content.size)
+        return name
+
+    def _link(self, name, blob):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        while True:
+            path = self.path(name)
+            target = os.path.relpath(self.path(blob), os.path.dirname(path))
+            try:
+                os.symlink(target, path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+            else:
+                return name
+
+    def _reference(self, digest, size):
+        _, created = _blobs().get_or_create(
+            digest=digest, defaults={'size': size, 'refcount': 1}
+        )
+        if not created:
+            _blobs().filter(pk=digest).update(refcount=F('refcount') + 1)
+
+    def delete(self, name):
+        digest = self.content_hash(name)
+        super().delete(name)
+        if digest is None:
+            return
+        _blobs().filter(pk=digest, refcount__gt=0).update(
+            refcount=F('refcount') - 1
+        )
+        deleted, _ = _blobs().filter(pk=digest, refcount=0).delete()
+        if deleted:
+            super().delete(self.blob_name(digest))
+
+    def adopt(self, name):
+        """Move a plain file into the store, in place.
+
+        The first copy of some content becomes its blob through a hard
+        link, so nothing is copied; the name is then swapped for a
+        symlink in one rename. Returns the number of bytes freed.
+        """
+        path = self.path(name)
+        if os.path.islink(path):
+            return 0
+        with open(path, 'rb') as source:
+            digest = _digest(iter(lambda: source.read(CHUNK_SIZE), b''))
+        size = os.path.getsize(path)
+        blob = self.path(self.blob_name(digest))
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+            freed = 0
+        except FileExistsError:
+            freed = size
+        link = f'{path}.{digest[:12]}.link'
+        os.symlink(os.path.relpath(blob, os.path.dirname(path)), link)
+        os.replace(link, path)
+        self._reference(digest, size)
+        return freed
+
+
+media_storage = ContentAddressedStorage()
+
+
+def release(names):
+    """Delete the files of ``names`` that no post refers to any more.
+
+    Called by posts.signals once a post's image is replaced, cleared or
+    deleted with it, so the last name of a blob takes the blob along.
+    """
+    names = set(filter(None, names))
+    if not names:
+        return
+    used = set(
+        _posts().filter(image__in=names).values_list('image', flat=True)
+    )
+    for name in names - used:
+        try:
+            media_storage.delete(name)
+        except SuspiciousFileOperation:
+            # A name outside MEDIA_ROOT was never stored here.
+            continue
@@ -0,0 +1,38 @@
+from jobs.queue import task
+
+from . import generations, thumbnails, timeline
+from .models import Follow, Post
+
+
+@task(thumbnails.TASK_NAME)
+def generate_thumbnails(post_id, name, queued_at):
+    thumbnails.generate(post_id, name, queued_at)
+
+
+@task('posts.fan_out', batch_size=100)
+def fan_out(payloads):
+    posts = Post.objects.filter(
+        pk__in=[payload['post_id'] for payload in payloads]
+    ).only('author_id', 'pub_date')
+    for post in posts:
+        timeline.fan_out(post)
+    # Follow pages rendered before the fan-out are stale; they are
+    # scoped on INDEX too (see posts.views.follow_scopes).
+    generations.bump(generations.INDEX)
+
+
+# A follow may be undone before its job runs, so both jobs check it.
+
+@task('posts.follow')
+def follow(user_id, author_id):
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+        generations.bump(generations.feed_scope(user_id))
+
+
+@task('posts.unfollow')
+def unfollow(user_id, author_id):
+    if not Follow.objects.filter(
+            user_id=user_id, author_id=author_id).exists():
+        timeline.prune(user_id, author_id)
+        generations.bump(generations.feed_scope(user_id))
@@ -0,0 +1,17 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context):
+    """``?`` and the request's parameters but the cursors, ready for one.
+
+    Links to other pages keep ``q``, ``engine`` and the like, so they
+    page through the same list.
+    """
+    params = context['request'].GET.copy()
+    for name in ('after', 'before'):
+        params.pop(name, None)
+    query = params.urlencode()
+    return f'?{query}&' if query else '?'
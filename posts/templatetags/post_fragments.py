@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def render_posts(context, posts):
+    return mark_safe(fragments.render_posts(posts, context.get('user')))
+
+
+@register.simple_tag(takes_context=True)
+def render_post(context, post):
+    return mark_safe(fragments.render_posts([post], context.get('user')))
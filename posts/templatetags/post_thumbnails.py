@@ -0,0 +1,31 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, geometry, **options):
+    """The ready thumbnail of the post image, or None.
+
+    Posts rendered through posts.fragments come with their thumbnails
+    already resolved in one batch. A missing thumbnail is queued for
+    generation; until it is ready the template shows the original image.
+    """
+    thumbnail = thumbnails.post_thumbnail(post, geometry, **options)
+    if thumbnail is None:
+        thumbnails.schedule(post)
+    return thumbnail
+
+
+@register.simple_tag
+def post_picture(post):
+    """The srcset variants of the post image, or None until all are ready.
+
+    A missing variant is queued like in post_thumbnail.
+    """
+    picture = thumbnails.post_picture(post)
+    if picture is None and post.image:
+        thumbnails.schedule(post)
+    return picture
@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import generations, timeline
+from posts.bulk import move_posts
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User
+)
+from posts.paginator import EstimatedCountPaginator
+from posts.search import SearchPaginator
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create(username='writer')
+        cls.cats = Group.objects.create(
+            title='Кошки', slug='cats', description='Тестовое описание'
+        )
+        cls.dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_posts(self, count, group=None):
+        return [
+            Post.objects.create(
+                text=f'Тестовый текст {i}', author=self.author, group=group
+            )
+            for i in range(count)
+        ]
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        posts = self.add_posts(2)
+        for post in posts:
+            Comment.objects.create(post=post, author=self.author, text='Да')
+        for name in ('post', 'comment'):
+            url = reverse(f'admin:posts_{name}_changelist')
+            few = self.count_queries(url)
+            post = Post.objects.create(text='Ещё', author=self.admin)
+            Comment.objects.create(post=post, author=self.admin, text='Нет')
+            self.assertEqual(self.count_queries(url), few, name)
+
+    @mock.patch('posts.paginator.EXACT_COUNT_LIMIT', 3)
+    def test_count_is_bounded_above_limit(self):
+        self.add_posts(5)
+        with mock.patch('posts.paginator.estimate_rows', return_value=1000):
+            paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+            self.assertEqual(paginator.count, 1000)
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(author=self.author), 10
+        )
+        self.assertEqual(paginator.count, 5)
+        paginator = EstimatedCountPaginator(Post.objects.filter(pk=0), 10)
+        self.assertEqual(paginator.count, 0)
+
+    def test_move_to_group(self):
+        posts = self.add_posts(3, self.cats)
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'move_to_group',
+                'group': 'dogs',
+                '_selected_action': [post.pk for post in posts[:2]],
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.dogs.posts.count(), 2)
+        self.assertEqual(self.cats.posts.count(), 1)
+        self.assertEqual(Post.objects.get(pk=posts[0].pk).version, 1)
+        self.assertEqual(move_posts(Post.objects.all(), self.cats, 1), 2)
+        self.assertEqual(self.cats.posts.count(), 3)
+        found = SearchPaginator('кошки', 10).get_cursor_page()
+        self.assertEqual(len(found), 3)
+
+    def test_delete_in_chunks(self):
+        count = settings.QUERY_REPEAT_THRESHOLD * 2
+        posts = self.add_posts(count + 1)
+        other = User.objects.create(username='other')
+        posts.append(Post.objects.create(
+            text='Тестовый текст', author=other, group=self.cats
+        ))
+        Comment.objects.create(post=posts[0], author=self.admin, text='Да')
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        timeline.rebuild()
+        scopes = [
+            generations.author_scope(self.author.username),
+            generations.group_scope(self.cats.slug),
+        ]
+        generation = generations.get(scopes)
+        selected = posts[:count] + posts[-1:]
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'delete_in_chunks',
+                '_selected_action': [post.pk for post in selected],
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Post.objects.all()), [posts[count]])
+        self.assertFalse(Comment.objects.exists())
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 1)
+        other.counters.refresh_from_db()
+        self.assertEqual(other.counters.posts_count, 0)
+        found = SearchPaginator('тестовый', 10).get_cursor_page()
+        self.assertEqual(list(found), [posts[count]])
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('post_id', flat=True)),
+            [posts[count].pk]
+        )
+        for scope, before in zip(scopes, generation):
+            self.assertNotEqual(generations.get([scope]), [before])
+
+    def test_single_delete_forgets_the_post(self):
+        post, kept = self.add_posts(2, self.cats)
+        post.delete()
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 1)
+        found = SearchPaginator('тестовый', 10).get_cursor_page()
+        self.assertEqual(list(found), [kept])
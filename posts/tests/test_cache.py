@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from yatube.cache import SQLiteCache, memoize
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def test_entries_are_shared_between_instances(self):
+        self.cache.set('key', {'value': 1})
+        other = SQLiteCache(self.location, {})
+        self.assertEqual(other.get('key'), {'value': 1})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_get_many_and_expiry(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.set('c', 3, timeout=-1)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.assertFalse(self.cache.has_key('c'))
+
+    def test_add_takes_missing_or_expired_keys_only(self):
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(self.cache.add('lock', 2))
+        self.assertEqual(self.cache.get('lock'), 1)
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_keeps_entries_that_never_expire(self):
+        cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2}}
+        )
+        cache.set_many({'token': 1, 'workers': 2}, timeout=None)
+        with mock.patch('yatube.cache.random.random', return_value=1):
+            cache.set_many({f'page{i}': i for i in range(4)}, timeout=60)
+        with mock.patch('yatube.cache.random.random', return_value=0):
+            cache.set('page4', 4, timeout=60)
+        self.assertEqual(cache.get_many(['token', 'workers']),
+                         {'token': 1, 'workers': 2})
+        self.assertEqual(len(cache.get_many(
+            [f'page{i}' for i in range(5)]
+        )), 2)
+
+    def test_suite_has_its_own_cache(self):
+        self.assertNotEqual(
+            settings.CACHES['default']['LOCATION'],
+            os.path.join(settings.BASE_DIR, 'cache.sqlite3')
+        )
+
+
+class MemoizeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SQLiteCache(
+            os.path.join(directory.name, 'cache.sqlite3'), {}
+        )
+        self.compute = mock.Mock(return_value='fresh')
+
+    def test_fresh_value_is_not_recomputed(self):
+        memoize('key', self.compute, 60, cache=self.cache)
+        self.assertEqual(memoize('key', self.compute, 60, cache=self.cache),
+                         'fresh')
+        self.assertEqual(self.compute.call_count, 1)
+
+    def test_stale_value_is_served_while_locked(self):
+        self.cache.set('key', ('stale', time.time() - 1))
+        self.cache.add('key:lock', 1)
+        self.assertEqual(memoize('key', self.compute, 60, cache=self.cache),
+                         'stale')
+        self.compute.assert_not_called()
+
+    def test_fallback_is_served_while_locked(self):
+        self.cache.set('last', ('previous', time.time() + 60))
+        self.cache.add('key:lock', 1)
+        value = memoize('key', self.compute, 60, fallback_key='last',
+                        on_stale=str.upper, cache=self.cache)
+        self.assertEqual(value, 'PREVIOUS')
+        self.compute.assert_not_called()
+
+    def test_lock_winner_refreshes_stale_value(self):
+        self.cache.set('key', ('stale', time.time() - 1))
+        self.assertEqual(memoize('key', self.compute, 60, cache=self.cache),
+                         'fresh')
+        self.assertEqual(self.cache.get('key')[0], 'fresh')
+        self.assertFalse(self.cache.has_key('key:lock'))
@@ -0,0 +1,145 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+from posts.forms import PostForm
+
+MAKE_PHOTO = '''
+import sys
+from PIL import Image
+exif = Image.Exif()
+exif[0x010F] = 'Camera'
+Image.new('RGB', (8660, 5774), (200, 100, 50)).save(
+    sys.argv[1], quality=90, exif=exif
+)
+'''
+
+INGEST_PHOTO = '''
+import json
+import resource
+import sys
+
+import django
+django.setup()
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+
+from posts.forms import PostForm
+
+upload = TemporaryUploadedFile('photo.jpg', 'image/jpeg', 0, None)
+with open(sys.argv[1], 'rb') as source:
+    for chunk in iter(lambda: source.read(1 << 20), b''):
+        upload.write(chunk)
+upload.size = upload.tell()
+upload.seek(0)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+form = PostForm(data={'text': 'text'}, files={'image': upload})
+valid = form.is_valid()
+grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+stored = Image.open(form.cleaned_data['image'])
+print(json.dumps({
+    'valid': valid,
+    'grown': grown * 1024,
+    'name': form.cleaned_data['image'].name,
+    'size': stored.size,
+    'exif': 'exif' in stored.info,
+}))
+'''
+
+
+def image_upload(name, size, **save_options):
+    image_format = Image.registered_extensions()[os.path.splitext(name)[1]]
+    buffer = BytesIO()
+    Image.new('RGB', size, (10, 20, 30)).save(
+        buffer, image_format, **save_options
+    )
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), Image.MIME[image_format]
+    )
+
+
+class IngestTest(SimpleTestCase):
+    def clean_image(self, upload):
+        form = PostForm(data={'text': 'Тестовый текст'},
+                        files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.cleaned_data['image']
+
+    def test_small_clean_image_is_stored_as_is(self):
+        upload = image_upload('small.png', (50, 50))
+        self.assertIs(self.clean_image(upload), upload)
+
+    def test_metadata_is_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        stored = self.clean_image(
+            image_upload('photo.jpg', (40, 20), exif=exif)
+        )
+        self.assertEqual(stored.name, 'photo.webp')
+        image = Image.open(stored)
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(image.size, (20, 40))
+
+    def test_oversized_image_is_downscaled(self):
+        side = settings.IMAGE_MAX_SIDE
+        image = Image.open(self.clean_image(
+            image_upload('wide.png', (side * 2, 10))
+        ))
+        self.assertEqual(image.size, (side, 5))
+
+    def test_image_over_memory_budget_is_rejected(self):
+        form = PostForm(
+            data={'text': 'Тестовый текст'},
+            files={'image': image_upload('big.png', (100, 100))}
+        )
+        with self.settings(IMAGE_MAX_SIDE=50, IMAGE_MEMORY_BUDGET=1000):
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_animated_image_is_kept_or_rejected(self):
+        buffer = BytesIO()
+        frames = [Image.new('P', (100, 20), i) for i in range(3)]
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        for max_side, budget, valid in ((100, 24000, True),
+                                        (99, 24000, False),
+                                        (100, 23999, False)):
+            upload = SimpleUploadedFile(
+                'animated.gif', buffer.getvalue(), 'image/gif'
+            )
+            form = PostForm(data={'text': 'Тестовый текст'},
+                            files={'image': upload})
+            with self.subTest(max_side=max_side, budget=budget), \
+                    self.settings(IMAGE_MAX_SIDE=max_side,
+                                  IMAGE_MEMORY_BUDGET=budget):
+                self.assertEqual(form.is_valid(), valid)
+                if valid:
+                    self.assertIs(form.cleaned_data['image'], upload)
+
+    def test_50mp_photo_stays_within_memory_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'photo.jpg')
+            subprocess.run(
+                [sys.executable, '-c', MAKE_PHOTO, path], check=True
+            )
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings')
+            output = subprocess.run(
+                [sys.executable, '-c', INGEST_PHOTO, path],
+                check=True, capture_output=True, env=env,
+                cwd=settings.BASE_DIR
+            ).stdout
+        result = json.loads(output)
+        self.assertTrue(result['valid'])
+        self.assertEqual(result['name'], 'photo.webp')
+        self.assertEqual(max(result['size']), settings.IMAGE_MAX_SIDE)
+        self.assertFalse(result['exif'])
+        self.assertLess(result['grown'], settings.IMAGE_MEMORY_BUDGET)
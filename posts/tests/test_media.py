@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts.media import Unsatisfiable, byte_range
+from posts.storage import media_storage
+
+CONTENT = bytes(range(256)) * 4
+
+
+def front_server(response):
+    """What nginx or Apache send for an offloaded response."""
+    if 'X-Accel-Redirect' in response:
+        name = response['X-Accel-Redirect'][
+            len(settings.MEDIA_ACCEL_PREFIX):
+        ]
+        path = os.path.join(settings.MEDIA_ROOT, name)
+    else:
+        path = response['X-Sendfile']
+    with open(path, 'rb') as file_:
+        return file_.read()
+
+
+class ByteRangeTest(SimpleTestCase):
+    def test_ranges(self):
+        cases = {
+            None: None,
+            'bytes=0-9': (0, 9),
+            'bytes=10-': (10, 99),
+            'bytes=-10': (90, 99),
+            'bytes=90-200': (90, 99),
+            'bytes=-200': (0, 99),
+            'bytes=9-0': None,
+            'bytes=0-1,5-6': None,
+            'items=0-1': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(byte_range(header, 100), expected)
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=100-', 'bytes=-0'):
+            with self.subTest(header=header):
+                with self.assertRaises(Unsatisfiable):
+                    byte_range(header, 100)
+
+
+@override_settings(MEDIA_OFFLOAD=None)
+class MediaServeTest(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.media = override_settings(MEDIA_ROOT=media)
+        self.media.enable()
+        self.addCleanup(self.media.disable)
+        self.name = media_storage.save('posts/data.bin', ContentFile(CONTENT))
+        self.url = settings.MEDIA_URL + self.name
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_whole_file_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(
+            response['ETag'], f'"{media_storage.content_hash(self.name)}"'
+        )
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, CONTENT[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(
+            response['Content-Range'], f'bytes 10-19/{len(CONTENT)}'
+        )
+        response = self.get(HTTP_RANGE='bytes=-4')
+        self.assertEqual(response.body, CONTENT[-4:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(
+            response['Content-Range'], f'bytes */{len(CONTENT)}'
+        )
+
+    def test_if_range(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.get(HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, CONTENT)
+
+    def test_plain_file_gets_stat_etag(self):
+        name = default_storage.save('cache/ab/thumb.jpg', ContentFile(b'x'))
+        response = self.get(settings.MEDIA_URL + name)
+        self.assertEqual(response.body, b'x')
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]+-[0-9a-f]+-1"$')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_offload(self):
+        for offload in ('X-Accel-Redirect', 'X-Sendfile'):
+            with self.subTest(offload=offload), \
+                    self.settings(MEDIA_OFFLOAD=offload):
+                response = self.get()
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, b'')
+                self.assertIn('ETag', response)
+                self.assertEqual(front_server(response), CONTENT)
+
+    def test_hidden_files_are_not_served(self):
+        blob = media_storage.blob_name(media_storage.content_hash(self.name))
+        default_storage.save('posts/.secret', ContentFile(b'x'))
+        for name in (blob, 'posts/.secret', '../manage.py', 'posts/'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.get(settings.MEDIA_URL + name).status_code, 404
+                )
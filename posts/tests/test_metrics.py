@@ -0,0 +1,86 @@
+import re
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import metrics
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        for i in range(3):
+            Post.objects.create(text=f'Тестовый текст {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics._series.clear()
+        self.client = Client()
+
+    def server_timing(self, response):
+        return dict(
+            (name, params) for name, _, params in (
+                part.partition(';') for part in
+                response['Server-Timing'].split(', ')
+            )
+        )
+
+    def test_server_timing_is_for_staff(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', response)
+        self.client.force_login(self.staff)
+        timing = self.server_timing(self.client.get(reverse('index')))
+        self.assertEqual(
+            list(timing), ['db', 'tpl', 'cache', 'view', 'total']
+        )
+        queries = int(re.search(r'"(\d+) SQL"', timing['db'])[1])
+        self.assertGreater(queries, 0)
+        self.assertRegex(timing['cache'], r'"\d+ hit \d+ miss"')
+
+    def test_series_per_view(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('profile', args=('user',)))
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.client.get('/no/such/page/at/all/')
+        series = metrics._series
+        self.assertEqual(series['index']['count'], 2)
+        self.assertEqual(series['profile']['queries_sum'], 2)
+        self.assertEqual(series['unresolved']['count'], 1)
+        self.assertGreater(series['index']['template'], 0)
+        self.assertGreater(series['index']['cache_misses'], 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('index'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=('10.0.0.1',)):
+            response = self.client.get(
+                reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+            )
+        text = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="index"} 1', text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="index",le="+Inf"} 1',
+            text
+        )
+        self.assertIn('# TYPE yatube_db_queries histogram', text)
+        self.assertRegex(text, r'yatube_cache_misses_total\{view="index"\} ')
+
+    def test_workers_are_merged(self):
+        self.client.get(reverse('index'))
+        metrics.flush()
+        other = {'index': metrics._new_series()}
+        other['index']['count'] = 5
+        cache.set(metrics._worker_key(-1), other)
+        cache.set(
+            metrics.WORKERS_KEY, cache.get(metrics.WORKERS_KEY) + (-1, -2)
+        )
+        self.assertEqual(metrics.collect()['index']['count'], 6)
+        self.assertNotIn(-2, cache.get(metrics.WORKERS_KEY))
@@ -1,6 +1,9 @@
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts.counters import recount
+from posts.models import (Comment, Follow, Group, Post, User,
+                          UserCounters)
 
 
 class GeneralModelTest(TestCase):
@@ -73,3 +76,76 @@ class GeneralModelTest(TestCase):
         post = GeneralModelTest.post
         expected_str = post.text[:15]
         self.assertEquals(expected_str, str(post))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.reader = User.objects.create(username='TestReader')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Тестовый комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+
+    def test_post_save_keeps_comment_count(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Тестовый комментарий'
+        )
+        post.text = 'Отредактированный текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_group_saves_keep_bumping_version(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for version in (1, 2):
+            group.title = f'Группа {version}'
+            group.save()
+            self.assertEqual(
+                Group.objects.get(pk=group.pk).version, version
+            )
+
+    def test_recount(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounters.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        Post.objects.update(comments_count=7)
+        recount(batch_size=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.author).following_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+
+    def test_follow_is_unique(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
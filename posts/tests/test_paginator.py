@@ -0,0 +1,155 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.feeds import MergeFeedPaginator, feed_engine
+from posts.models import Follow, Post, User
+from posts.paginator import CursorPaginator, decode_cursor, encode_cursor
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый текст {i}', author=cls.user)
+            for i in range(25)
+        )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-id'))
+        cls.guest_client = Client()
+
+    def test_cursor_roundtrip(self):
+        post = self.posts[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post.pub_date, post.pk)),
+            (post.pub_date, post.pk)
+        )
+        self.assertIsNone(decode_cursor('не курсор'))
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_cursor_page()
+        self.assertEqual(list(first), self.posts[:10])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.posts[10:20])
+        third = paginator.get_cursor_page(after=second.next_cursor)
+        self.assertEqual(list(third), self.posts[20:])
+        self.assertFalse(third.has_next())
+        back = paginator.get_cursor_page(before=third.previous_cursor)
+        self.assertEqual(list(back), self.posts[10:20])
+        self.assertTrue(back.has_previous())
+
+    def test_index_uses_cursor_links(self):
+        response = self.guest_client.get(reverse('index'))
+        page = response.context['page']
+        self.assertContains(response, f'?after={page.next_cursor}')
+        response = self.guest_client.get(
+            reverse('index'), {'after': page.next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page']), self.posts[10:20]
+        )
+
+    def test_numbered_pages_are_gone(self):
+        self.assertEqual(
+            self.guest_client.get(reverse('index'), {'page': 1}).status_code,
+            200
+        )
+        for url in (reverse('index'), reverse('search')):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, {'q': 'т', 'page': 2})
+                self.assertEqual(response.status_code, 404)
+
+    def test_bench_with_one_page(self):
+        out = StringIO()
+        call_command('bench_pagination', pages=1, repeat=1, stdout=out)
+        self.assertIn('CursorPaginator  страница      1', out.getvalue())
+
+
+@mock.patch('posts.feeds.HEAD_SIZE', 3)
+class MergeFeedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create(username=f'TestAuthor{i}') for i in range(3)
+        ]
+        for i in range(8):
+            for author in cls.authors:
+                Post.objects.create(text=f'Тестовый текст {i}', author=author)
+        cls.posts = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_merge_matches_global_order(self):
+        paginator = MergeFeedPaginator([a.pk for a in self.authors], 10)
+        first = paginator.get_cursor_page()
+        self.assertEqual(list(first), self.posts[:10])
+        second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.posts[10:20])
+        third = paginator.get_cursor_page(after=second.next_cursor)
+        self.assertEqual(list(third), self.posts[20:])
+        self.assertFalse(third.has_next())
+        back = paginator.get_cursor_page(before=third.previous_cursor)
+        self.assertEqual(list(back), self.posts[10:20])
+
+    def test_page_past_heads_costs_one_window_query(self):
+        paginator = MergeFeedPaginator([a.pk for a in self.authors], 5)
+        first = paginator.get_cursor_page()
+        second = paginator.get_cursor_page(after=first.next_cursor)
+        # One window query for every author past the head, one in_bulk.
+        with self.assertNumQueries(2):
+            third = paginator.get_cursor_page(after=second.next_cursor)
+        self.assertEqual(list(third), self.posts[10:15])
+        with mock.patch('posts.feeds.HEAD_CHUNK', 2):
+            with self.assertNumQueries(3):
+                back = paginator.get_cursor_page(
+                    before=third.previous_cursor
+                )
+        self.assertEqual(list(back), self.posts[5:10])
+
+    def test_merge_engine_selected_per_request(self):
+        reader = User.objects.create(username='TestReader')
+        for author in self.authors[:2]:
+            Follow.objects.create(user=reader, author=author)
+        client = Client()
+        client.force_login(reader)
+        expected = [p for p in self.posts if p.author in self.authors[:2]]
+        for engine in ('merge', 'timeline'):
+            with self.subTest(engine=engine):
+                response = client.get(
+                    reverse('follow_index'), {'engine': engine}
+                )
+                self.assertEqual(list(response.context['page']), expected[:10])
+
+    def test_cursor_keeps_engine_across_threshold(self):
+        reader = User.objects.create(username='TestReader')
+        for author in self.authors[:2]:
+            Follow.objects.create(user=reader, author=author)
+        client = Client()
+        client.force_login(reader)
+        expected = [p for p in self.posts if p.author in self.authors[:2]]
+        with self.settings(FEED_MERGE_THRESHOLD=3):
+            first = client.get(reverse('follow_index')).context['page']
+        self.assertTrue(first.next_cursor.startswith('timeline.'))
+        with self.settings(FEED_MERGE_THRESHOLD=1):
+            second = client.get(
+                reverse('follow_index'), {'after': first.next_cursor}
+            ).context['page']
+        self.assertEqual(list(second), expected[10:])
+
+    def test_user_without_counters_gets_timeline(self):
+        reader = User.objects.create(username='TestReader')
+        reader.counters.delete()
+        request = RequestFactory().get(reverse('follow_index'))
+        request.user = User.objects.get(pk=reader.pk)
+        with self.settings(FEED_MERGE_THRESHOLD=0):
+            self.assertEqual(feed_engine(request), 'timeline')
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class PartialsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(25):
+            Post.objects.create(
+                text=f'Тестовый текст {i}', author=cls.author,
+                group=cls.group
+            )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def walk(self, page_url, url):
+        """Cards on every partial after the page, by X-Next-Cursor."""
+        cursor = self.client.get(page_url).context['page'].next_cursor
+        pages = []
+        while cursor:
+            response = self.client.get(url, {'after': cursor})
+            self.assertNotIn('<nav', response.content.decode())
+            pages.append(response.content.decode().count('card-body'))
+            cursor = response.get('X-Next-Cursor')
+        return pages
+
+    def test_partials_continue_the_page(self):
+        for page, partial, args in (('index', 'index_partial', ()),
+                                    ('group', 'group_partial', ('group',)),
+                                    ('profile', 'profile_partial',
+                                     ('author',))):
+            with self.subTest(page=page):
+                self.assertEqual(self.walk(
+                    reverse(page, args=args), reverse(partial, args=args)
+                ), [10, 5])
+
+    def test_index_partial_matches_second_page(self):
+        first = self.client.get(reverse('index')).context['page']
+        response = self.client.get(
+            reverse('index_partial'), {'after': first.next_cursor}
+        )
+        content = response.content.decode()
+        for post in self.posts[10:20]:
+            self.assertIn(f'name="post_{post.pk}"', content)
+        self.assertNotIn(f'name="post_{self.posts[20].pk}"', content)
+
+    def test_follow_partial_requires_login(self):
+        response = self.client.get(reverse('follow_partial'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('follow_partial'))
+        self.assertEqual(response.content.decode().count('card-body'), 10)
+        self.assertIn('X-Next-Cursor', response)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_cached_fragments_cost_one_query(self):
+        first = self.client.get(reverse('index')).context['page']
+        url = reverse('index_partial')
+        self.client.get(url, {'after': first.next_cursor})
+        with self.assertNumQueries(1):
+            self.client.get(url, {'after': first.next_cursor})
+
+    def test_pages_keep_links_and_load_more(self):
+        response = self.client.get(reverse('group', args=('group',)))
+        page = response.context['page']
+        self.assertContains(response, f'?after={page.next_cursor}')
+        self.assertContains(
+            response,
+            f'data-url="{reverse("group_partial", args=("group",))}?"'
+        )
+        self.assertContains(response, f'data-next="{page.next_cursor}"')
+
+    def test_follow_links_keep_engine(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(
+            reverse('follow_index'), {'engine': 'merge'}
+        )
+        page = response.context['page']
+        self.assertContains(
+            response, f'?engine=merge&amp;after={page.next_cursor}'
+        )
+        url = reverse('follow_partial')
+        self.assertContains(response, f'data-url="{url}?engine=merge&amp;"')
+
+    def test_unknown_group_or_author_is_404(self):
+        for partial, arg in (('group_partial', 'missing'),
+                             ('profile_partial', 'missing')):
+            with self.subTest(partial=partial):
+                response = self.client.get(reverse(partial, args=(arg,)))
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,71 @@
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts.models import Post, User
+from yatube.queries import (
+    RepeatedQueries, RepeatedQueriesMiddleware, fingerprint
+)
+
+TEMPLATE = '''{% for post in posts %}
+{{ post.author.username }}
+{% endfor %}'''
+
+
+class FingerprintTest(TestCase):
+    def test_parameters_are_normalized(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "posts_post" WHERE "id" = 12'),
+            fingerprint('SELECT * FROM "posts_post"  WHERE "id" = %s')
+        )
+        self.assertEqual(
+            fingerprint("SELECT 1 WHERE slug = 'it''s' AND id IN (?, ?)"),
+            'SELECT ? WHERE slug = ? AND id IN (...)'
+        )
+
+    def test_different_queries_differ(self):
+        self.assertNotEqual(
+            fingerprint('SELECT * FROM "posts_post" WHERE "id" = 1'),
+            fingerprint('SELECT * FROM "posts_group" WHERE "id" = 1')
+        )
+
+
+class RepeatedQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(7):
+            author = User.objects.create(username=f'author{i}')
+            Post.objects.create(text=f'Тестовый текст {i}', author=author)
+
+    def middleware(self, select_related=False):
+        def view(request):
+            posts = Post.objects.all()
+            if select_related:
+                posts = posts.select_related('author')
+            template = engines.all()[0].from_string(TEMPLATE)
+            return HttpResponse(template.render({'posts': posts}))
+        return RepeatedQueriesMiddleware(view)
+
+    @override_settings(QUERY_REPEAT_RAISE=True)
+    def test_n_plus_one_raises_with_template_line(self):
+        request = RequestFactory().get('/posts/')
+        with self.assertRaises(RepeatedQueries) as raised:
+            self.middleware()(request)
+        message = str(raised.exception)
+        self.assertIn('/posts/', message)
+        self.assertIn('7x SELECT', message)
+        self.assertIn('6x из <unknown source>:2', message)
+
+    @override_settings(QUERY_REPEAT_RAISE=True)
+    def test_select_related_passes(self):
+        response = self.middleware(select_related=True)(
+            RequestFactory().get('/posts/')
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_REPEAT_RAISE=False)
+    def test_logged_in_production(self):
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            response = self.middleware()(RequestFactory().get('/posts/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('7x SELECT', logs.output[0])
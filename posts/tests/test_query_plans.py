@@ -0,0 +1,78 @@
+import unittest
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовое название',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                text=f'Тестовый текст {i}',
+                author=cls.user,
+                group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def main_query(self, url, table, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            sql = query['sql']
+            if f'FROM "{table}"' in sql and 'ORDER BY' in sql:
+                return sql, response
+        self.fail(f'{url}: не найден запрос к {table}')
+
+    def assertIndexedPlan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        for step in plan:
+            self.assertNotIn('TEMP B-TREE', step, plan)
+            if step.startswith('SCAN'):
+                self.assertIn('INDEX', step, plan)
+
+    def test_feed_queries_use_indexes(self):
+        urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                sql, response = self.main_query(url, 'posts_post')
+                self.assertIndexedPlan(sql)
+                after = response.context['page'].next_cursor
+                sql, _ = self.main_query(url, 'posts_post', {'after': after})
+                self.assertIndexedPlan(sql)
+
+    def test_comments_query_uses_index(self):
+        sql, _ = self.main_query(
+            reverse('post', kwargs={
+                'username': self.user.username,
+                'post_id': self.post.id
+            }),
+            'posts_comment'
+        )
+        self.assertIndexedPlan(sql)
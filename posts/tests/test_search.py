@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.search import SearchPaginator, rebuild
+
+
+def found(query):
+    return list(SearchPaginator(query, 100).get_cursor_page())
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='writer')
+        self.group = Group.objects.create(
+            title='Кошки',
+            slug='cats',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            text='Рыжий кот спит на подоконнике',
+            author=self.user,
+            group=self.group
+        )
+
+    def test_index_follows_post_changes(self):
+        self.assertEqual(found('кот'), [self.post])
+        self.post.text = 'Собака лает'
+        self.post.save()
+        self.assertEqual(found('кот'), [])
+        self.assertEqual(found('собака'), [self.post])
+        self.post.delete()
+        self.assertEqual(found('собака'), [])
+
+    def test_index_follows_author_and_group(self):
+        self.assertEqual(found('кошки'), [self.post])
+        self.group.title = 'Коты'
+        self.group.save()
+        self.assertEqual(found('кошки'), [])
+        self.assertEqual(found('коты'), [self.post])
+        self.user.username = 'author'
+        self.user.save()
+        self.assertEqual(found('author'), [self.post])
+
+    def test_author_is_reindexed_on_rename_only(self):
+        self.user.first_name = 'Имя'
+        with mock.patch('posts.search.rename_author') as rename:
+            self.user.save()
+            rename.assert_not_called()
+            self.user.username = 'author'
+            self.user.save()
+        rename.assert_called_once_with(self.user.pk, 'author')
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(found('кот) "спит*'), [self.post])
+        self.assertEqual(found('*^'), [])
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild(batch_size=1), 1)
+        self.assertEqual(found('подоконник'), [self.post])
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='writer')
+        Post.objects.create(text='кот ' * 10, author=cls.user)
+        for i in range(14):
+            Post.objects.create(text=f'кот номер {i}', author=cls.user)
+        Post.objects.create(text='собака', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_results_are_ranked_and_paginated(self):
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        first = response.context['page']
+        self.assertEqual(first[0].text, 'кот ' * 10)
+        self.assertEqual(len(first), 10)
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82&amp;after=')
+        second = self.client.get(
+            reverse('search'), {'q': 'кот', 'after': first.next_cursor}
+        ).context['page']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            reverse('search'), {'q': 'кот', 'before': second.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back), list(first))
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page'])
+        self.assertNotContains(response, 'Ничего не найдено.')
+
+    def test_nothing_found(self):
+        response = self.client.get(reverse('search'), {'q': 'zzzqqq'})
+        self.assertContains(response, 'Ничего не найдено.')
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/admin/posts/post/')
+        queryset, duplicates = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'собака'
+        )
+        self.assertEqual([post.text for post in queryset], ['собака'])
+        self.assertFalse(duplicates)
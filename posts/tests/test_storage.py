@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import MediaBlob, Post, User
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.media = override_settings(MEDIA_ROOT=media)
+        self.media.enable()
+        self.addCleanup(self.media.disable)
+        self.user = User.objects.create(username='TestUser')
+        self.storage = Post._meta.get_field('image').storage
+
+    def create_post(self, content=SMALL_GIF):
+        return Post.objects.create(
+            text='Тестовый текст', author=self.user,
+            image=SimpleUploadedFile('small.gif', content, 'image/gif')
+        )
+
+    def test_identical_uploads_are_stored_once(self):
+        first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, 'posts/small.gif')
+        self.assertNotEqual(second.image.name, first.image.name)
+        digest = self.storage.content_hash(first.image.name)
+        self.assertEqual(digest, self.storage.content_hash(second.image.name))
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.digest, blob.refcount), (digest, 2))
+        for post in (first, second):
+            self.assertEqual(post.image.read(), SMALL_GIF)
+            post.image.close()
+
+    def test_blob_goes_with_its_last_name(self):
+        first, second = self.create_post(), self.create_post()
+        blob = self.storage.blob_name(
+            self.storage.content_hash(first.image.name)
+        )
+        self.storage.delete(first.image.name)
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        self.assertTrue(self.storage.exists(blob))
+        self.storage.delete(second.image.name)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(self.storage.exists(blob))
+
+    def test_identical_uploads_share_thumbnails(self):
+        first, second = self.create_post(), self.create_post()
+        other = self.create_post(SMALL_GIF.replace(b'\xFF' * 3, b'\x01' * 3))
+        geometry, options = thumbnails.GEOMETRIES[0]
+
+        def name(post):
+            return thumbnails.backend.thumbnail_file(
+                post.image, geometry, **options
+            ).name
+
+        self.assertEqual(name(first), name(second))
+        self.assertNotEqual(name(first), name(other))
+        thumbnails.generate(first.pk, first.image.name)
+        self.assertIsNotNone(
+            thumbnails.ready_thumbnail(second.image, geometry, **options)
+        )
+
+    def test_dedupe_moves_existing_files_into_store(self):
+        for name in ('posts/a.gif', 'posts/b.gif'):
+            os.makedirs(self.storage.path('posts'), exist_ok=True)
+            with open(self.storage.path(name), 'wb') as file_:
+                file_.write(SMALL_GIF)
+        self.storage.save('posts/c.gif', ContentFile(b'other'))
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('Файлов: 3, перенесено: 2', out.getvalue())
+        for name in ('posts/a.gif', 'posts/b.gif'):
+            self.assertTrue(os.path.islink(self.storage.path(name)))
+            with self.storage.open(name) as file_:
+                self.assertEqual(file_.read(), SMALL_GIF)
+        self.assertEqual(
+            dict(MediaBlob.objects.values_list('size', 'refcount')),
+            {len(SMALL_GIF): 2, len(b'other'): 1}
+        )
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class ReleaseImageTest(TransactionTestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.media = override_settings(MEDIA_ROOT=media)
+        self.media.enable()
+        self.addCleanup(self.media.disable)
+        self.user = User.objects.create_superuser(
+            'TestUser', 'test@example.com', 'password'
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.storage = Post._meta.get_field('image').storage
+        self.posts = [
+            Post.objects.create(
+                text='Тестовый текст', author=self.user,
+                image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+            )
+            for _ in range(2)
+        ]
+        self.blob = self.storage.blob_name(
+            self.storage.content_hash(self.posts[0].image.name)
+        )
+
+    def edit(self, post, data):
+        return self.client.post(
+            reverse('post_edit', kwargs={
+                'username': self.user.username, 'post_id': post.pk
+            }),
+            dict(data, text='Тестовый текст')
+        )
+
+    def test_blob_goes_with_its_last_post(self):
+        first, second = self.posts
+        self.edit(first, {'image-clear': 'on'})
+        self.assertFalse(self.storage.exists(first.image.name))
+        self.assertTrue(self.storage.exists(self.blob))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+        other = SimpleUploadedFile(
+            'other.gif', SMALL_GIF.replace(b'\xFF' * 3, b'\x01' * 3),
+            'image/gif'
+        )
+        self.edit(second, {'image': other})
+        self.assertFalse(self.storage.exists(second.image.name))
+        self.assertFalse(self.storage.exists(self.blob))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+
+    def test_admin_delete_releases_images(self):
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'delete_in_chunks',
+                '_selected_action': [post.pk for post in self.posts],
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(self.storage.exists(self.blob))
@@ -0,0 +1,220 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from jobs.models import Job
+from posts import thumbnails
+from posts.models import Post, User
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(JOBS_ALWAYS_EAGER=True)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = override_settings(
+            MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR)
+        )
+        cls.media.enable()
+        cls.user = User.objects.create(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        cls.media.disable()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content=SMALL_GIF):
+        return SimpleUploadedFile(
+            name='small.gif', content=content, content_type='image/gif'
+        )
+
+    def image_src(self, post):
+        response = self.client.get(
+            reverse('post', args=(self.user.username, post.pk))
+        )
+        return response.content.decode()
+
+    def test_original_is_shown_until_thumbnail_is_ready(self):
+        # Content of its own: identical uploads share thumbnails.
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user,
+            image=self.upload(SMALL_GIF.replace(b'\xFF' * 3, b'\x01' * 3))
+        )
+        with self.settings(JOBS_ALWAYS_EAGER=False):
+            self.assertIn(post.image.url, self.image_src(post))
+        self.assertTrue(thumbnails.generate(post.pk, post.image.name))
+        post.refresh_from_db()
+        self.assertEqual(post.version, 1)
+        geometry, options = thumbnails.GEOMETRIES[0]
+        ready = thumbnails.ready_thumbnail(post.image, geometry, **options)
+        self.assertIn(ready.url, self.image_src(post))
+
+    def test_picture_offers_every_variant_with_placeholder(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image=self.upload()
+        )
+        thumbnails.generate(post.pk, post.image.name)
+        post.refresh_from_db()
+        self.assertTrue(
+            post.placeholder.startswith('data:image/jpeg;base64,')
+        )
+        html = self.image_src(post)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('width="960" height="339" loading="lazy"', html)
+        self.assertIn(post.placeholder, html)
+        for geometry, options in thumbnails.GEOMETRIES:
+            ready = thumbnails.ready_thumbnail(post.image, geometry, **options)
+            self.assertIn(f'{ready.url} {ready.width}w', html)
+
+    def test_new_post_queues_thumbnails(self):
+        before = thumbnails.stats()
+        self.client.post(
+            reverse('new_post'),
+            {'text': 'Тестовый текст', 'image': self.upload()}
+        )
+        after = thumbnails.stats()
+        self.assertEqual(after['done'], before['done'] + 1)
+        self.assertEqual(after['queued'], before['queued'])
+        post = Post.objects.get()
+        geometry, options = thumbnails.GEOMETRIES[0]
+        self.assertIsNotNone(
+            thumbnails.ready_thumbnail(post.image, geometry, **options)
+        )
+
+    def test_worker_results_are_on_metrics(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image=self.upload()
+        )
+        with self.settings(JOBS_ALWAYS_EAGER=False):
+            thumbnails.schedule(post)
+            staff = User.objects.create(username='staff', is_staff=True)
+            self.client.force_login(staff)
+            text = self.client.get(reverse('metrics')).content.decode()
+            self.assertIn('yatube_thumbnail_jobs_queued 1\n', text)
+            call_command('run_jobs', once=True, stdout=StringIO())
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_thumbnail_jobs_queued 0\n', text)
+        self.assertIn('yatube_thumbnails_done_total 1\n', text)
+        self.assertIn('yatube_thumbnails_failed_total 0\n', text)
+        self.assertRegex(text, r'yatube_thumbnail_latency_max_ms \d+\n')
+
+    def test_missing_source_is_queued_once(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image='posts/missing.gif'
+        )
+        failed = thumbnails.stats()['failed']
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            self.image_src(post)
+        self.image_src(post)
+        self.assertEqual(thumbnails.stats()['failed'], failed + 1)
+        post.refresh_from_db()
+        self.assertEqual(post.version, 0)
+
+    def test_transient_error_is_retried_by_the_queue(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image=self.upload()
+        )
+        with self.settings(JOBS_ALWAYS_EAGER=False):
+            thumbnails.schedule(post)
+            self.assertEqual(thumbnails.stats()['queued'], 1)
+            with mock.patch.object(
+                    thumbnails, 'render',
+                    side_effect=OperationalError('database is locked')), \
+                    self.assertLogs('jobs.queue', 'ERROR'):
+                call_command('run_jobs', once=True, stdout=StringIO())
+            job = Job.objects.get()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertEqual(job.attempts, 1)
+            Job.objects.update(run_at=job.created)
+            call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertEqual(thumbnails.stats()['queued'], 0)
+        post.refresh_from_db()
+        self.assertTrue(post.placeholder)
+
+    def test_prefetch_resolves_a_page_in_one_query(self):
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'Тестовый текст {i}', author=self.user,
+                image=self.upload()
+            )
+            thumbnails.generate(post.pk, post.image.name)
+        Post.objects.create(text='Без картинки', author=self.user)
+        cache.clear()
+        thumbnails._lru.clear()
+        posts = list(Post.objects.all())
+        geometry, options = thumbnails.GEOMETRIES[0]
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts)
+        self.assertEqual(len(queries), 1)
+        with mock.patch.object(thumbnails, 'lookup_many') as lookup:
+            found = [
+                thumbnails.post_thumbnail(post, geometry, **options)
+                for post in posts
+            ]
+        lookup.assert_not_called()
+        self.assertEqual(sum(thumbnail is not None for thumbnail in found), 3)
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts)
+        self.assertEqual(len(queries), 0)
+
+    def test_backfill_skips_ready_images_and_resumes(self):
+        posts = [
+            Post.objects.create(
+                text=f'Тестовый текст {i}', author=self.user,
+                image=self.upload()
+            )
+            for i in range(4)
+        ]
+        Post.objects.create(text='Без картинки', author=self.user)
+        thumbnails.generate(posts[1].pk, posts[1].image.name)
+        cache.set(thumbnails.BACKFILL_CHECKPOINT, posts[0].pk, None)
+        out = StringIO()
+        call_command(
+            'backfill_thumbnails', workers=2, batch_size=2, stdout=out
+        )
+        self.assertIn('создано: 2, пропущено: 1, ошибок: 0', out.getvalue())
+        self.assertIsNone(cache.get(thumbnails.BACKFILL_CHECKPOINT))
+        thumbnails._lru.clear()
+        for post in Post.objects.filter(pk__in=[p.pk for p in posts[1:]]):
+            self.assertTrue(post.placeholder)
+            self.assertIsNotNone(thumbnails.post_picture(post))
+        posts[0].refresh_from_db()
+        self.assertEqual(posts[0].placeholder, '')
+
+    def test_backfill_regenerates_deleted_files(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image=self.upload()
+        )
+        thumbnails.generate(post.pk, post.image.name)
+        geometry, options = thumbnails.GEOMETRIES[0]
+        ready = thumbnails.ready_thumbnail(post.image, geometry, **options)
+        ready.storage.delete(ready.name)
+        out = StringIO()
+        call_command('backfill_thumbnails', workers=1, stdout=out)
+        self.assertIn('создано: 1, пропущено: 0', out.getvalue())
+        self.assertTrue(ready.exists())
@@ -39,6 +39,10 @@ class GeneralURLTests(TestCase):
                 'username': self.user.username,
                 'post_id': self.post.id
             }): 302,
+            reverse('post', kwargs={
+                'username': self.user2.username,
+                'post_id': self.post.id
+            }): 404,
             'nonexistent': 404
         }
         for url, expected_status in urls.items():
@@ -1,14 +1,21 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts import page_cache
+from posts.fragments import fragment_key
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
 
 
 class GeneralModelTest(TestCase):
@@ -249,17 +256,287 @@ class GeneralModelTest(TestCase):
         )
         self.assertEqual(count, Comment.objects.count())
 
-    def test_index_page_cache(self):
-        response = self.authorized_client.get(reverse('index'))
-        content_first = response.content
-        Post.objects.create(
-            text='Тестовый текст 2',
-            author=self.user
+    def test_profile_runs_no_aggregate_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(
+                reverse('profile', kwargs={'username': self.user.username})
+            )
+        self.assertFalse(
+            [q['sql'] for q in queries if 'COUNT(' in q['sql']]
+        )
+        self.assertContains(
+            self.guest_client.get(
+                reverse('profile', kwargs={'username': self.user.username})
+            ),
+            'Записей: 1'
         )
+
+    def test_index_fragment_cache(self):
+        cache.clear()
+        self.authorized_client.get(reverse('index'))
+        post = Post.objects.feed().get(pk=self.post.pk)
+        self.assertIsNotNone(cache.get(fragment_key(post)))
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        Post.objects.create(text='Тестовый текст 2', author=self.user)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Отредактированный текст')
+        self.assertContains(response, 'Тестовый текст 2')
+        self.group.title = 'Новое название'
+        self.group.save()
         response = self.authorized_client.get(reverse('index'))
-        content_second = response.content
-        self.assertEqual(content_first, content_second)
+        self.assertContains(response, '#Новое название')
+
+    def test_renamed_author_on_index(self):
+        post = Post.objects.create(text='Тестовый текст 2', author=self.user2)
         cache.clear()
+        self.guest_client.get(reverse('index'))
+        author = User.objects.get(pk=self.user2.pk)
+        author.username = 'RenamedUser'
+        author.save()
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, '@RenamedUser')
+        self.assertNotContains(response, '@TestUser2')
+        post_url = reverse('post', kwargs={
+            'username': 'RenamedUser', 'post_id': post.id
+        })
+        self.assertContains(response, post_url)
+        self.assertEqual(self.guest_client.get(post_url).status_code, 200)
+
+    def test_fragment_actions_depend_on_user(self):
+        cache.clear()
+        edit_url = reverse('post_edit', kwargs={
+            'username': self.user.username,
+            'post_id': self.post.id
+        })
         response = self.authorized_client.get(reverse('index'))
-        content_third = response.content
-        self.assertNotEqual(content_second, content_third)
+        self.assertContains(response, edit_url)
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, edit_url)
+
+
+class FeedQueryBudgetTest(TestCase):
+    QUERY_BUDGET = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовое название',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+        cls.urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            reverse('follow_index'),
+        )
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'Тестовый текст {i}',
+                author=self.user,
+                group=self.group
+            )
+            Comment.objects.create(
+                post=post, author=self.reader, text='Тестовый комментарий'
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_reader.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_pages_fit_query_budget(self):
+        self.add_posts(1)
+        single = {url: self.count_queries(url) for url in self.urls}
+        self.add_posts(9)
+        for url in self.urls:
+            with self.subTest(url=url):
+                queries = self.count_queries(url)
+                self.assertLessEqual(queries, self.QUERY_BUDGET)
+                self.assertEqual(queries, single[url])
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.old_post = Post.objects.create(
+            text='Старый текст', author=cls.author
+        )
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('follow_index'))
+        return list(response.context['page'])
+
+    def test_timeline_follows_subscriptions(self):
+        self.reader_client.get(
+            reverse('profile_follow', kwargs={'username': 'TestAuthor'})
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(text='Новый текст', author=self.author)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        new_post.delete()
+        self.assertEqual(self.feed(), [self.old_post])
+        self.reader_client.get(
+            reverse('profile_unfollow', kwargs={'username': 'TestAuthor'})
+        )
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_rebuild_timelines(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовое название',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group
+        )
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            reverse('post', kwargs={
+                'username': cls.user.username,
+                'post_id': cls.post.id
+            }),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_anonymous_hits_skip_the_view(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                hits = page_cache.stats()['hits']
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(page_cache.stats()['hits'], hits + 1)
+
+    def test_comment_retires_cached_pages(self):
+        for url in self.urls:
+            self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Тестовый комментарий'
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIsNotNone(response.context)
+                self.assertContains(response, 'Комментариев: 1')
+
+    def test_authorized_pages_are_not_cached(self):
+        self.authorized_client.get(self.urls[0])
+        response = self.authorized_client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовое название',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.guest_client = Client()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            reverse('post', kwargs={
+                'username': cls.user.username,
+                'post_id': cls.post.id
+            }),
+        )
+
+    def test_not_modified_costs_at_most_one_query(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 1)
+
+    def test_follow_not_modified_skips_feed(self):
+        url = reverse('follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            [q['sql'] for q in queries if 'posts_' in q['sql']]
+        )
+
+    def test_login_again_changes_the_etag(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        url = self.urls[3]
+        etag = client.get(url)['ETag']
+        client.logout()
+        client.force_login(self.reader)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        response = client.post(
+            reverse('add_comment', kwargs={
+                'username': self.user.username, 'post_id': self.post.id
+            }),
+            {
+                'text': 'Тестовый комментарий',
+                'csrfmiddlewaretoken': str(response.context['csrf_token'])
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_changes_and_viewer_change_the_etag(self):
+        url = self.urls[0]
+        etag = self.guest_client.get(url)['ETag']
+        self.assertNotEqual(self.reader_client.get(url)['ETag'], etag)
+        Post.objects.create(text='Тестовый текст 2', author=self.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Тестовый текст 2')
@@ -0,0 +1,527 @@
+import base64
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import F
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import (
+    ImageFile, deserialize_image_file, serialize_image_file
+)
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.helpers import deserialize, serialize, tokey
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from jobs.queue import defer
+from jobs.queue import stats as queue_stats
+
+from . import generations
+from .counters import bump_post
+from .models import Post
+from .signals import bump_post_pages
+
+# Every geometry the templates render: post_item.html picks one of
+# WIDTHS at the 960x339 banner aspect, as WebP where the browser takes
+# it and JPEG otherwise. The last format is the <img> fallback.
+WIDTHS = (480, 960, 1440)
+FORMATS = {
+    'WEBP': {'format': 'WEBP', 'quality': 80},
+    'JPEG': {'format': 'JPEG'},
+}
+BANNER = (960, 339)
+GEOMETRIES = tuple(
+    (
+        f'{width}x{round(width * BANNER[1] / BANNER[0])}',
+        {'crop': 'center', 'upscale': True, **format_options}
+    )
+    for format_options in FORMATS.values()
+    for width in WIDTHS
+)
+# The slot the card image fills at each Bootstrap container width.
+SIZES = (
+    '(min-width: 1200px) 1110px, (min-width: 992px) 930px, '
+    '(min-width: 768px) 690px, (min-width: 576px) 510px, 100vw'
+)
+PLACEHOLDER_SIZE = (24, 8)
+PLACEHOLDER_QUALITY = 40
+PENDING_TIMEOUT = 60 * 10
+BACKFILL_BATCH_SIZE = 200
+BACKFILL_CHECKPOINT = 'thumbnail:backfill:after'
+LRU_SIZE = 4096
+TASK_NAME = 'posts.thumbnails'
+STATS = ('done', 'failed', 'latency_ms', 'latency_max_ms')
+# Errors of the source image itself, which no retry can fix.
+BROKEN_SOURCE = (
+    FileNotFoundError, SuspiciousFileOperation, UnidentifiedImageError,
+    Image.DecompressionBombError
+)
+
+logger = logging.getLogger(__name__)
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+class Backend(ThumbnailBackend):
+    def resolve(self, file_, geometry_string, **options):
+        """The file ``get_thumbnail`` would return, without creating it,
+        and the full options it would be created with."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage), options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        return self.resolve(file_, geometry_string, **options)[0]
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        # Keyed on the content, not the name, so identical uploads share
+        # one set of thumbnails; see posts.storage.
+        content_hash = getattr(source.storage, 'content_hash', None)
+        digest = content_hash(source.name) if content_hash else None
+        if digest is None:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options
+            )
+        key = tokey(digest, geometry_string, serialize(options))
+        return (
+            f'{thumbnail_settings.THUMBNAIL_PREFIX}{key[:2]}/{key[2:4]}/'
+            f'{key}.{EXTENSIONS[options["format"]]}'
+        )
+
+
+backend = Backend()
+
+
+def _remember(key, thumbnail):
+    with _lru_lock:
+        _lru[key] = thumbnail
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup_many(files):
+    """Stored thumbnails among ``files``, keyed by ``ImageFile.key``.
+
+    Hot entries come from an in-process LRU; the rest are resolved with
+    one cache get_many and, for cache misses, one query on sorl's
+    KVStore table, the way its cached_db store would do one by one.
+    Only ready thumbnails are remembered, so a miss is never sticky.
+    """
+    found, missing = {}, []
+    with _lru_lock:
+        for file_ in files:
+            if file_.key in _lru:
+                _lru.move_to_end(file_.key)
+                found[file_.key] = _lru[file_.key]
+            else:
+                missing.append(file_)
+    if not missing:
+        return found
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        for file_ in missing:
+            thumbnail = kvstore.get(file_)
+            if thumbnail is not None:
+                found[file_.key] = thumbnail
+        return found
+    raw_keys = {add_prefix(file_.key): file_.key for file_ in missing}
+    values = kvstore.cache.get_many(raw_keys)
+    unknown = [raw for raw in raw_keys if raw not in values]
+    if unknown:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=unknown)
+            .values_list('key', 'value')
+        )
+        kvstore.cache.set_many(
+            {raw: stored.get(raw, EMPTY_VALUE) for raw in unknown},
+            thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(stored)
+    for raw, value in values.items():
+        if value and value != EMPTY_VALUE:
+            thumbnail = deserialize_image_file(value)
+            found[raw_keys[raw]] = thumbnail
+            _remember(raw_keys[raw], thumbnail)
+    return found
+
+
+def ready_thumbnail(image, geometry, **options):
+    """The stored thumbnail, or None while it has not been generated."""
+    if not image:
+        return None
+    file_ = backend.thumbnail_file(image, geometry, **options)
+    return lookup_many([file_]).get(file_.key)
+
+
+def prefetch(posts):
+    """Resolve the thumbnails of all ``posts`` in one batch.
+
+    The results are attached to the posts, where the post_thumbnail tag
+    finds them instead of looking each image up on its own.
+    """
+    files = []
+    for post in posts:
+        if post.image:
+            post._thumbnails = {}
+            files.extend(
+                (post, _spec(geometry, options),
+                 backend.thumbnail_file(post.image, geometry, **options))
+                for geometry, options in GEOMETRIES
+            )
+    found = lookup_many(file_ for _, _, file_ in files)
+    for post, spec, file_ in files:
+        post._thumbnails[spec] = found.get(file_.key)
+
+
+def _spec(geometry, options):
+    return geometry, tuple(sorted(options.items()))
+
+
+def post_thumbnail(post, geometry, **options):
+    if not post.image:
+        return None
+    spec = _spec(geometry, options)
+    prefetched = getattr(post, '_thumbnails', {})
+    if spec in prefetched:
+        return prefetched[spec]
+    return ready_thumbnail(post.image, geometry, **options)
+
+
+Picture = namedtuple('Picture', 'sources srcset src sizes width height')
+
+
+def _srcset(thumbnails):
+    return ', '.join(
+        f'{thumbnail.url} {thumbnail.width}w' for thumbnail in thumbnails
+    )
+
+
+def post_picture(post):
+    """Every ready variant of the post image, or None until all are."""
+    variants = {}
+    for geometry, options in GEOMETRIES:
+        thumbnail = post_thumbnail(post, geometry, **options)
+        if thumbnail is None:
+            return None
+        variants.setdefault(options['format'], []).append(thumbnail)
+    *sources, fallback = FORMATS
+    src = variants[fallback][WIDTHS.index(BANNER[0])]
+    return Picture(
+        sources=[
+            (Image.MIME[image_format], _srcset(variants[image_format]))
+            for image_format in sources
+        ],
+        srcset=_srcset(variants[fallback]),
+        src=src.url,
+        sizes=SIZES,
+        width=BANNER[0],
+        height=BANNER[1],
+    )
+
+
+def placeholder(name):
+    """A blurred data: URI of a few hundred bytes to show while loading."""
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        image.draft('RGB', tuple(side * 4 for side in PLACEHOLDER_SIZE))
+        image = ImageOps.fit(image.convert('RGB'), PLACEHOLDER_SIZE)
+    buffer = BytesIO()
+    image.filter(ImageFilter.GaussianBlur(1)).save(
+        buffer, 'JPEG', quality=PLACEHOLDER_QUALITY
+    )
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def render(name):
+    """Write every missing geometry of one image, decoding it once.
+
+    Only storage is touched, so this also runs in worker processes; the
+    serialized source, thumbnails and placeholder are registered by
+    record(). ``get_thumbnail`` would decode the source per geometry.
+    """
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    source_image = None
+    rendered = []
+    try:
+        for geometry, options in GEOMETRIES:
+            thumbnail, options = backend.resolve(source, geometry, **options)
+            if thumbnail.exists():
+                thumbnail.set_size()
+            else:
+                if source_image is None:
+                    source_image = default.engine.get_image(source)
+                    source.set_size(
+                        default.engine.get_image_size(source_image)
+                    )
+                    image_info = default.engine.get_image_info(source_image)
+                backend._create_thumbnail(
+                    source_image, geometry,
+                    dict(options, image_info=image_info), thumbnail
+                )
+            rendered.append(thumbnail)
+    finally:
+        if source_image is not None:
+            default.engine.cleanup(source_image)
+    source.set_size()
+    # The smallest variant is plenty for a 24x8 preview.
+    smallest = min(rendered, key=lambda thumbnail: thumbnail.width)
+    return (
+        serialize_image_file(source),
+        [serialize_image_file(thumbnail) for thumbnail in rendered],
+        placeholder(smallest.name),
+    )
+
+
+def record(source, rendered):
+    """Register thumbnails made by render() in sorl's key-value store.
+
+    Like lookup_many, the cached_db store is written in one batch: one
+    query for what is already stored and one bulk insert, where sorl
+    would read and write every thumbnail on its own.
+    """
+    kvstore = default.kvstore
+    source = deserialize_image_file(source)
+    thumbnails = [deserialize_image_file(value) for value in rendered]
+    if not isinstance(kvstore, KVStore):
+        source = kvstore.get_or_set(source)
+        for thumbnail in thumbnails:
+            kvstore.set(thumbnail, source)
+        return
+    source_key = add_prefix(source.key)
+    list_key = add_prefix(source.key, 'thumbnails')
+    values = {
+        add_prefix(thumbnail.key): serialize_image_file(thumbnail)
+        for thumbnail in thumbnails
+    }
+    stored = dict(
+        KVStoreModel.objects.filter(
+            key__in=[source_key, list_key, *values]
+        ).values_list('key', 'value')
+    )
+    values[source_key] = stored.get(source_key) or serialize_image_file(
+        source
+    )
+    known = set(deserialize(stored[list_key])) if list_key in stored else set()
+    values[list_key] = serialize(
+        sorted(known | {thumbnail.key for thumbnail in thumbnails})
+    )
+    KVStoreModel.objects.bulk_create(
+        (KVStoreModel(key=key, value=value)
+         for key, value in values.items() if key not in stored),
+        ignore_conflicts=True
+    )
+    for key, value in values.items():
+        if key in stored and stored[key] != value:
+            KVStoreModel.objects.filter(key=key).update(value=value)
+    kvstore.cache.set_many(values, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+
+def _stats_key(name):
+    return f'thumbnail:stats:{name}'
+
+
+def _count(name, value=1):
+    # Jobs run in the run_jobs workers: their results are kept in the
+    # shared cache, where the web processes serving /metrics read them.
+    cache.add(_stats_key(name), 0, None)
+    cache.incr(_stats_key(name), value)
+
+
+def _count_done(latency_ms):
+    _count('done')
+    _count('latency_ms', round(latency_ms))
+    # Not atomic: a concurrent slower job may be lost until the next one.
+    if latency_ms > cache.get(_stats_key('latency_max_ms'), 0):
+        cache.set(_stats_key('latency_max_ms'), round(latency_ms), None)
+
+
+def stats():
+    """Thumbnail jobs waiting in the queue, and the results of all workers."""
+    queued = sum(
+        row['ready'] + row['waiting'] + row['running']
+        for row in queue_stats() if row['name'] == TASK_NAME
+    )
+    values = cache.get_many([_stats_key(name) for name in STATS])
+    done, failed, latency, latency_max = (
+        values.get(_stats_key(name), 0) for name in STATS
+    )
+    return {
+        'queued': queued,
+        'done': done,
+        'failed': failed,
+        'latency_avg_ms': latency / done if done else 0,
+        'latency_max_ms': latency_max,
+    }
+
+
+METRICS = (
+    ('yatube_thumbnail_jobs_queued', 'gauge', 'queued',
+     'Thumbnail jobs in the queue'),
+    ('yatube_thumbnails_done_total', 'counter', 'done',
+     'Images whose thumbnails were made'),
+    ('yatube_thumbnails_failed_total', 'counter', 'failed',
+     'Images whose source is broken'),
+    ('yatube_thumbnail_latency_avg_ms', 'gauge', 'latency_avg_ms',
+     'Mean time from upload to thumbnails'),
+    ('yatube_thumbnail_latency_max_ms', 'gauge', 'latency_max_ms',
+     'Longest time from upload to thumbnails'),
+)
+
+
+def metrics():
+    """stats() in the Prometheus text format, for /metrics."""
+    current = stats()
+    lines = []
+    for metric, kind, key, text in METRICS:
+        lines += [
+            f'# HELP {metric} {text}',
+            f'# TYPE {metric} {kind}',
+            f'{metric} {current[key]}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def _pending_key(name):
+    return f'thumbnail:pending:{name}'
+
+
+def generate(post_id, name, queued_at=None):
+    """Create every geometry and the placeholder of one image, then
+    retire its fragments.
+
+    Returns whether all thumbnails are ready; a missing or broken source
+    leaves the post on its original image. Other errors, such as a locked
+    database or failing storage, are raised for the job to be retried.
+    """
+    queued_at = queued_at or time.time()
+    try:
+        source, rendered, preview = render(name)
+    except BROKEN_SOURCE:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        _count('failed')
+        return False
+    record(source, rendered)
+    posts = Post.objects.filter(pk=post_id, image=name)
+    posts.update(placeholder=preview)
+    post = posts.select_related('author', 'group').first()
+    if post is not None:
+        bump_post(post.pk)
+        bump_post_pages(post)
+    _count_done((time.time() - queued_at) * 1000)
+    return True
+
+
+def schedule(post):
+    """Queue thumbnail generation for the post image.
+
+    The job is run by the run_jobs worker, or inline with
+    JOBS_ALWAYS_EAGER. An image is queued at most once per
+    ``PENDING_TIMEOUT``, so a failing source is not retried on every page.
+    """
+    if not post.image or not cache.add(
+            _pending_key(post.image.name), 1, PENDING_TIMEOUT):
+        return
+    defer(
+        TASK_NAME, post_id=post.pk, name=post.image.name,
+        queued_at=time.time()
+    )
+
+
+def _ready(post):
+    # The key-value store outlives the files it points at, e.g. when
+    # media is restored from a backup, so the files are checked too.
+    thumbnails = post._thumbnails.values()
+    return (
+        bool(post.placeholder) and None not in thumbnails
+        and all(thumbnail.exists() for thumbnail in thumbnails)
+    )
+
+
+def _missing(posts):
+    prefetch(posts)
+    return [post for post in posts if not _ready(post)]
+
+
+def backfill(workers=None, batch_size=BACKFILL_BATCH_SIZE, restart=False):
+    """Create the missing thumbnails of every post image on a process pool.
+
+    Posts are walked by pk, one short query per batch: a single
+    ``iterator()`` would keep SQLite read-locked, and live writers
+    waiting, for the whole run. Images with every thumbnail stored, in
+    the key-value store and as a file, are skipped; the rest are
+    rendered by ``workers`` processes, which only touch storage, and
+    recorded here. The last finished batch is kept in
+    the cache, so an interrupted run resumes after it.
+
+    Yields the running totals after every batch.
+    """
+    after = 0 if restart else cache.get(BACKFILL_CHECKPOINT, 0)
+    posts = (
+        Post.objects.exclude(image='').exclude(image=None)
+        .select_related('author', 'group')
+        .only('image', 'placeholder', 'author__username', 'group__slug')
+        .order_by('pk')
+    )
+    totals = Counter()
+    # Forked workers inherit the configured Django; they never use the
+    # database connection they inherit.
+    with ProcessPoolExecutor(
+            workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context('fork')) as pool:
+        while True:
+            batch = list(posts.filter(pk__gt=after)[:batch_size])
+            if not batch:
+                break
+            todo = _missing(batch)
+            futures = {
+                pool.submit(render, post.image.name): post for post in todo
+            }
+            scopes = set()
+            for future in as_completed(futures):
+                post = futures[future]
+                try:
+                    source, rendered, preview = future.result()
+                except Exception:
+                    logger.exception(
+                        'Не удалось создать миниатюры %s', post.image.name
+                    )
+                    totals['failed'] += 1
+                    continue
+                record(source, rendered)
+                Post.objects.filter(pk=post.pk, image=post.image.name).update(
+                    placeholder=preview, version=F('version') + 1
+                )
+                scopes.update(generations.post_scopes(
+                    post, post.group.slug if post.group_id else None
+                ))
+                totals['done'] += 1
+            if scopes:
+                generations.bump(*scopes)
+            totals['skipped'] += len(batch) - len(todo)
+            after = batch[-1].pk
+            cache.set(BACKFILL_CHECKPOINT, after, None)
+            yield totals
+    cache.delete(BACKFILL_CHECKPOINT)
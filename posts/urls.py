@@ -18,11 +18,36 @@ urlpatterns = [
         views.follow_index,
         name='follow_index'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'group/<slug:slug>/',
         views.group_posts,
         name='group'
     ),
+    path(
+        'partials/',
+        views.index_partial,
+        name='index_partial'
+    ),
+    path(
+        'partials/follow/',
+        views.follow_partial,
+        name='follow_partial'
+    ),
+    path(
+        'partials/group/<slug:slug>/',
+        views.group_partial,
+        name='group_partial'
+    ),
+    path(
+        'partials/profile/<str:username>/',
+        views.profile_partial,
+        name='profile_partial'
+    ),
     path(
         '<str:username>/',
         views.profile,
@@ -1,16 +1,38 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import thumbnails
+from .feeds import follow_page
 from .forms import CommentForm, PostForm
+from .fragments import render_posts
+from .generations import INDEX, author_scope, feed_scope, group_scope
 from .models import Follow, Group, Post, User
+from .page_cache import cache_anonymous_page, conditional_page
+from .paginator import paginate
+from .search import search_page
 
 
+def index_scopes(request):
+    return [INDEX]
+
+
+def group_scopes(request, slug):
+    return [group_scope(slug)]
+
+
+def author_scopes(request, username, post_id=None):
+    return [author_scope(username)]
+
+
+def follow_scopes(request):
+    return [INDEX, feed_scope(request.user.pk)]
+
+
+@conditional_page(index_scopes)
+@cache_anonymous_page(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, Post.objects.feed())
     context = {
         'page': page
     }
@@ -21,15 +43,13 @@ def index(request):
     )
 
 
+@conditional_page(group_scopes)
+@cache_anonymous_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, Post.objects.feed().filter(group=group))
     context = {
         'group': group,
-        'posts': posts,
         'page': page
     }
     return render(
@@ -39,6 +59,22 @@ def group_posts(request, slug):
     )
 
 
+@conditional_page(index_scopes)
+@cache_anonymous_page(index_scopes)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = search_page(request, query) if query else None
+    context = {
+        'query': query,
+        'page': page
+    }
+    return render(
+        request,
+        'posts/search.html',
+        context
+    )
+
+
 @login_required
 def new_post(request):
     form = PostForm(
@@ -49,6 +85,7 @@ def new_post(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('index')
     context = {
         'form': form
@@ -60,24 +97,21 @@ def new_post(request):
     )
 
 
+@conditional_page(author_scopes)
+@cache_anonymous_page(author_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
     ).exists()
-    following_count = Follow.objects.filter(user=author).count()
-    followers_count = Follow.objects.filter(author=author).count()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, Post.objects.feed().filter(author=author))
     context = {
         'author': author,
-        'posts': posts,
         'following': following,
-        'following_count': following_count,
-        'followers_count': followers_count,
         'page': page,
     }
     return render(
@@ -87,20 +121,26 @@ def profile(request, username):
     )
 
 
+@conditional_page(author_scopes)
+@cache_anonymous_page(author_scopes)
 def post_view(request, username, post_id):
-    author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    # The page is cached on the author in the URL, so it must be theirs.
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        pk=post_id,
+        author=author
+    )
     form = CommentForm()
-    comments = post.comments.all()
-    following_count = Follow.objects.filter(user=author).count()
-    followers_count = Follow.objects.filter(author=author).count()
+    comments = post.comments.select_related('author')
     context = {
         'author': author,
         'post': post,
         'form': form,
-        'comments': comments,
-        'following_count': following_count,
-        'followers_count': followers_count
+        'comments': comments
     }
     return render(
         request,
@@ -126,6 +166,8 @@ def post_edit(request, username, post_id):
     )
     if request.user == post.author and form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect(
             'post',
             username=username,
@@ -188,18 +230,63 @@ def add_comment(request, username, post_id):
 
 
 @login_required
+@conditional_page(follow_scopes)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = follow_page(request)
     context = {
-        'posts': posts,
         'page': page
     }
     return render(request, 'follow.html', context)
 
 
+def posts_partial(request, page):
+    """Only the post cards of ``page``, for infinite scroll.
+
+    The cards come from the fragment cache; the cursor of the page after
+    them is sent in X-Next-Cursor, which is absent on the last page.
+    """
+    response = HttpResponse(render_posts(page, request.user))
+    if page.next_cursor:
+        response['X-Next-Cursor'] = page.next_cursor
+    return response
+
+
+@conditional_page(index_scopes)
+@cache_anonymous_page(index_scopes)
+def index_partial(request):
+    return posts_partial(request, paginate(request, Post.objects.feed()))
+
+
+# Filtering on the joined group and author, already selected for the
+# cards, keeps a partial to one query; only an empty page checks that
+# the group or author exists, to answer 404 like the full page.
+
+@conditional_page(group_scopes)
+@cache_anonymous_page(group_scopes)
+def group_partial(request, slug):
+    page = paginate(request, Post.objects.feed().filter(group__slug=slug))
+    if not page.object_list:
+        get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return posts_partial(request, page)
+
+
+@conditional_page(author_scopes)
+@cache_anonymous_page(author_scopes)
+def profile_partial(request, username):
+    page = paginate(
+        request, Post.objects.feed().filter(author__username=username)
+    )
+    if not page.object_list:
+        get_object_or_404(User.objects.only('pk'), username=username)
+    return posts_partial(request, page)
+
+
+@login_required
+@conditional_page(follow_scopes)
+def follow_partial(request):
+    return posts_partial(request, follow_page(request))
+
+
 @login_required
 def profile_follow(request, username):
     follow_user = get_object_or_404(User, username=username)
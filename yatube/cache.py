@@ -0,0 +1,254 @@
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import record_cache
+
+# SQLite limits the number of host parameters in one statement.
+CHUNK_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    """Cache shared by every worker process on the host.
+
+    Entries live in one SQLite file in WAL mode, so readers never block
+    the writer and all gunicorn workers see the same entries and the same
+    invalidations. Each process and thread keeps its own connection.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        options = params.get('OPTIONS', {})
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.location,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _write(self, rows):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._maybe_cull()
+
+    def _maybe_cull(self):
+        if self._cull_frequency and random.random() < 1 / 100:
+            db = self._db
+            db.execute(
+                'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+                (time.time(),)
+            )
+            (total,) = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if total > self._max_entries:
+                # Entries that never expire, such as generation tokens,
+                # go last: SQLite sorts NULL before any number.
+                db.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (total // self._cull_frequency,)
+                )
+
+    def get(self, key, default=None, version=None):
+        started = time.perf_counter()
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._db.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            record_cache(0, 1, started)
+            return default
+        value = pickle.loads(row[0])
+        record_cache(1, 0, started)
+        return value
+
+    def get_many(self, keys, version=None):
+        started = time.perf_counter()
+        keys = {self.make_key(key, version=version): key for key in keys}
+        found = {}
+        made = list(keys)
+        now = time.time()
+        for start in range(0, len(made), CHUNK_SIZE):
+            chunk = made[start:start + CHUNK_SIZE]
+            rows = self._db.execute(
+                'SELECT key, value FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                (*chunk, now)
+            )
+            for key, value in rows:
+                found[keys[key]] = pickle.loads(value)
+        record_cache(len(found), len(keys) - len(found), started)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write([(key, self._dumps(value), self._expires(timeout))])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        self._write([
+            (self.make_key(key, version=version), self._dumps(value), expires)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._db.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._dumps(value), self._expires(timeout), time.time())
+        )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key)
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version=version) for key in keys]
+        for start in range(0, len(made), CHUNK_SIZE):
+            chunk = made[start:start + CHUNK_SIZE]
+            self._db.execute(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)),
+                chunk
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.02
+
+
+def memoize(key, compute, timeout, grace=60, fallback_key=None,
+            cacheable=None, on_stale=None, cache=None):
+    """Single-flight get-or-compute with stale-while-revalidate.
+
+    Values are stored with their freshness deadline and kept ``grace``
+    seconds past it. Of all processes that find the value stale or
+    missing, only the one that takes the lock recomputes; the others
+    serve the stale copy (or the one under ``fallback_key``, which
+    survives key changes such as generation bumps) or, when there is
+    none, wait for the winner's result.
+    """
+    cache = cache or default_cache
+    entry = cache.get(key)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    if entry is None and fallback_key:
+        entry = cache.get(fallback_key)
+    lock = f'{key}:lock'
+    if cache.add(lock, os.getpid(), LOCK_TIMEOUT):
+        try:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                stored = (value, time.time() + timeout)
+                data = {key: stored}
+                if fallback_key:
+                    data[fallback_key] = stored
+                cache.set_many(data, timeout + grace)
+            return value
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        return on_stale(entry[0]) if on_stale else entry[0]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline and cache.has_key(lock):
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise
+)
+from django.utils.module_loading import import_string
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+WORKERS_KEY = 'metrics:workers'
+WORKER_TIMEOUT = 60 * 60
+UNRESOLVED = 'unresolved'
+
+_local = threading.local()
+_series = {}
+_series_lock = threading.Lock()
+_next_flush = 0
+
+
+class Timings:
+    """What one request spent, filled in as it runs."""
+
+    __slots__ = (
+        'queries', 'db', 'template', 'cache', 'cache_hits', 'cache_misses',
+        'view_started', 'view', 'total', 'depth',
+    )
+
+    def __init__(self):
+        self.queries = self.cache_hits = self.cache_misses = self.depth = 0
+        self.db = self.template = self.cache = self.view = self.total = 0.0
+        self.view_started = None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def header(self):
+        return ', '.join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} SQL"',
+            f'tpl;dur={self.template * 1000:.1f}',
+            f'cache;dur={self.cache * 1000:.1f};'
+            f'desc="{self.cache_hits} hit {self.cache_misses} miss"',
+            f'view;dur={self.view * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+
+def current():
+    """Timings of the request this thread is serving, or None."""
+    return getattr(_local, 'timings', None)
+
+
+def record_cache(hits, misses, started):
+    timings = current()
+    if timings is not None:
+        timings.cache += time.perf_counter() - started
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = current()
+        if timings is None:
+            return super().render(context, request)
+        # Templates render others through includes and tags; only the
+        # outermost render counts, so nothing is counted twice.
+        timings.depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.depth -= 1
+            if not timings.depth:
+                timings.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for MetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _new_series():
+    return {
+        'count': 0,
+        'duration': [0] * (len(DURATION_BUCKETS) + 1),
+        'duration_sum': 0.0,
+        'queries': [0] * (len(QUERY_BUCKETS) + 1),
+        'queries_sum': 0,
+        'db': 0.0,
+        'template': 0.0,
+        'cache': 0.0,
+        'view': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+    }
+
+
+def record(view_name, timings):
+    with _series_lock:
+        series = _series.get(view_name)
+        if series is None:
+            series = _series[view_name] = _new_series()
+        series['count'] += 1
+        series['duration'][bisect_left(DURATION_BUCKETS, timings.total)] += 1
+        series['duration_sum'] += timings.total
+        series['queries'][bisect_left(QUERY_BUCKETS, timings.queries)] += 1
+        series['queries_sum'] += timings.queries
+        for name in ('db', 'template', 'cache', 'view', 'cache_hits',
+                     'cache_misses'):
+            series[name] += getattr(timings, name)
+
+
+def _worker_key(pid):
+    return f'metrics:worker:{pid}'
+
+
+def flush():
+    """Publish this process's totals for /metrics to merge.
+
+    Every worker keeps its own series in memory; the first request
+    after METRICS_FLUSH_INTERVAL seconds writes them to the shared
+    cache, so all other requests leave the cache alone.
+    """
+    global _next_flush
+    _next_flush = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+    pid = os.getpid()
+    with _series_lock:
+        snapshot = {
+            name: {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in series.items()
+            }
+            for name, series in _series.items()
+        }
+    cache.set(_worker_key(pid), snapshot, WORKER_TIMEOUT)
+    workers = cache.get(WORKERS_KEY, ())
+    if pid not in workers:
+        # A registration lost to a concurrent one is redone next flush.
+        cache.set(WORKERS_KEY, workers + (pid,), None)
+
+
+def _merge(total, series):
+    for key, value in series.items():
+        if isinstance(value, list):
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] += value
+
+
+def collect():
+    """The series of every live worker, summed per view name."""
+    flush()
+    workers = cache.get(WORKERS_KEY, ())
+    snapshots = cache.get_many([_worker_key(pid) for pid in workers])
+    alive = tuple(pid for pid in workers if _worker_key(pid) in snapshots)
+    if alive != workers:
+        cache.set(WORKERS_KEY, alive, None)
+    merged = {}
+    for snapshot in snapshots.values():
+        for name, series in snapshot.items():
+            _merge(merged.setdefault(name, _new_series()), series)
+    return merged
+
+
+def _label(view_name):
+    escaped = view_name.replace('\\', '\\\\').replace('"', '\\"')
+    return f'view="{escaped}"'
+
+
+def _histogram(lines, metric, label, counts, bounds, total, count):
+    cumulative = 0
+    for bound, value in zip(bounds + ('+Inf',), counts):
+        cumulative += value
+        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_sum{{{label}}} {total}')
+    lines.append(f'{metric}_count{{{label}}} {count}')
+
+
+COUNTERS = (
+    ('yatube_db_seconds_total', 'db', 'Time spent in SQL'),
+    ('yatube_template_seconds_total', 'template', 'Time spent rendering'),
+    ('yatube_cache_seconds_total', 'cache', 'Time spent reading the cache'),
+    ('yatube_view_seconds_total', 'view', 'Time spent in the view'),
+    ('yatube_cache_hits_total', 'cache_hits', 'Cache hits'),
+    ('yatube_cache_misses_total', 'cache_misses', 'Cache misses'),
+)
+
+
+def render(merged):
+    """Prometheus text exposition of the merged series."""
+    lines = [
+        '# HELP yatube_request_duration_seconds Request duration',
+        '# TYPE yatube_request_duration_seconds histogram',
+    ]
+    for name, series in sorted(merged.items()):
+        _histogram(
+            lines, 'yatube_request_duration_seconds', _label(name),
+            series['duration'], DURATION_BUCKETS, series['duration_sum'],
+            series['count']
+        )
+    lines += [
+        '# HELP yatube_db_queries SQL queries per request',
+        '# TYPE yatube_db_queries histogram',
+    ]
+    for name, series in sorted(merged.items()):
+        _histogram(
+            lines, 'yatube_db_queries', _label(name), series['queries'],
+            QUERY_BUCKETS, series['queries_sum'], series['count']
+        )
+    for metric, key, text in COUNTERS:
+        lines += [f'# HELP {metric} {text}', f'# TYPE {metric} counter']
+        lines += [
+            f'{metric}{{{_label(name)}}} {series[key]}'
+            for name, series in sorted(merged.items())
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed and not request.user.is_staff:
+        return HttpResponseForbidden()
+    text = render(collect()) + ''.join(
+        import_string(path)() for path in settings.METRICS_EXTRA
+    )
+    return HttpResponse(text, content_type='text/plain; version=0.0.4')
+
+
+class MetricsMiddleware:
+    """Records SQL, template, cache and view time of every request.
+
+    Totals go to per-view series served by ``metrics``; staff also get
+    them in a Server-Timing header. Put it first in MIDDLEWARE, so that
+    ``total`` covers the other middleware; ``view`` runs from the view
+    to the end of the inner middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _local.timings = Timings()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        ended = time.perf_counter()
+        timings.total = ended - started
+        if timings.view_started is not None:
+            timings.view = ended - timings.view_started
+        match = request.resolver_match
+        record(match.view_name if match else UNRESOLVED, timings)
+        if time.monotonic() >= _next_flush:
+            flush()
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = timings.header()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current().view_started = time.perf_counter()
@@ -0,0 +1,140 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+# Transaction bookkeeping repeats by design.
+IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+REPORTED_LOCATIONS = 3
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'IN \(\?(?:, \?)*\)')
+_SPACE = re.compile(r'\s+')
+_SKIPPED_FILES = (
+    __file__, os.path.join(os.path.dirname(__file__), 'metrics.py')
+)
+
+
+class RepeatedQueries(Exception):
+    pass
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """``sql`` with its literals and placeholders replaced by ``?``.
+
+    Queries that differ only in their parameters, or in the length of an
+    IN list, get the same fingerprint.
+    """
+    sql = _STRING.sub('?', sql).replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', _NUMBER.sub('?', sql))
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _in_project(filename):
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in filename
+        and filename not in _SKIPPED_FILES
+    )
+
+
+def location(frame):
+    """Where the query running in ``frame`` comes from.
+
+    The innermost template node being rendered, as ``template:line``,
+    or project frame, as ``path:line in function``, whichever is closer
+    to the query: ``{{ post.author }}`` points at its template line, a
+    loop in a view or template tag at that code.
+    """
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            if isinstance(node, Node) and token is not None:
+                origin = node.origin
+                name = origin.template_name or origin.name
+                return f'{name}:{token.lineno}'
+        elif _in_project(code.co_filename):
+            path = os.path.relpath(code.co_filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryLog:
+    """Counts the fingerprints of one request's queries.
+
+    Locations are only looked up for repeats, so a request without
+    repeated queries pays for the fingerprint alone.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.locations = defaultdict(Counter)
+
+    def execute(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        if not key.startswith(IGNORED):
+            self.counts[key] += 1
+            if self.counts[key] > 1:
+                self.locations[key][location(sys._getframe(1))] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """(fingerprint, count, most common locations) over the threshold."""
+        return [
+            (key, count,
+             self.locations[key].most_common(REPORTED_LOCATIONS))
+            for key, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+
+def report(path, repeated):
+    lines = [f'Повторяющиеся запросы в {path}:']
+    for key, count, locations in repeated:
+        lines.append(f'  {count}x {key}')
+        lines += [
+            f'    {repeats}x из {where}' for where, repeats in locations
+        ]
+    return '\n'.join(lines)
+
+
+class RepeatedQueriesMiddleware:
+    """Finds N+1 queries: one fingerprint run over and over in a request.
+
+    A request running some fingerprint more than QUERY_REPEAT_THRESHOLD
+    times is reported with the template lines and code that ran it,
+    logged as a warning, or raised as RepeatedQueries when
+    QUERY_REPEAT_RAISE is on, as it is in the test suites.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog(settings.QUERY_REPEAT_THRESHOLD)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log.execute))
+            response = self.get_response(request)
+        repeated = log.repeated()
+        if repeated:
+            message = report(request.get_full_path(), repeated)
+            if settings.QUERY_REPEAT_RAISE:
+                raise RepeatedQueries(message)
+            logger.warning(message)
+        return response
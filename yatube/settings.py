@@ -39,6 +39,8 @@ INSTALLED_APPS = [
     'about',
     'users',
     'posts',
+    'jobs',
+    'api',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.queries.RepeatedQueriesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,7 +67,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
         'DIRS': [
             TEMPLATES_DIR,
             os.path.join(TEMPLATES_DIR, 'posts'),
@@ -145,11 +149,81 @@ LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Mail is queued and sent by the run_jobs worker through
+# JOBS_EMAIL_BACKEND (see jobs.backends).
+EMAIL_BACKEND = 'jobs.backends.EmailBackend'
+JOBS_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# One SQLite file shared by all worker processes on the host (see
+# yatube.cache), so an invalidation made by one worker reaches the others.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Feeds
+
+# Readers following at least this many authors get the k-way merge feed
+# instead of the materialized timeline (see posts.feeds).
+FEED_MERGE_THRESHOLD = 1000
+
+# Whole responses for anonymous visitors (see posts.page_cache); 0 disables.
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Images
+
+# Uploaded images are stored at most this many pixels per side, and their
+# decoding may take at most this many bytes (see posts.ingest).
+IMAGE_MAX_SIDE = 2048
+IMAGE_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Media
+
+# How /media/ files are sent (see posts.media): 'X-Accel-Redirect' hands
+# them to nginx through the internal MEDIA_ACCEL_PREFIX location,
+# 'X-Sendfile' to Apache or lighttpd, None streams them from Django.
+MEDIA_OFFLOAD = None if DEBUG else 'X-Accel-Redirect'
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_CACHE_TIMEOUT = 60 * 60 * 24 * 365
+
+# API
+
+# Longest ?wait= of the api polling endpoints, in seconds; a waiting
+# request holds its worker for that long.
+API_LONG_POLL_MAX = 25
+
+# Metrics
+
+# Each worker publishes its request metrics for /metrics this often, in
+# seconds (see yatube.metrics). /metrics is open to staff and to these
+# addresses, e.g. a Prometheus server's; behind the proxy every request
+# comes from 127.0.0.1, so that must never be listed.
+METRICS_FLUSH_INTERVAL = 10
+METRICS_ALLOWED_IPS = ()
+# Functions whose text /metrics appends, for numbers kept outside the
+# request series, such as those of the run_jobs workers.
+METRICS_EXTRA = ('posts.thumbnails.metrics',)
+
+# A request running one query fingerprint more often than this is
+# reported as an N+1 (see yatube.queries): logged, or raised when
+# QUERY_REPEAT_RAISE is on, as TEST_RUNNER and conftest.py turn it on in
+# the test suites.
+QUERY_REPEAT_THRESHOLD = 5
+QUERY_REPEAT_RAISE = False
+TEST_RUNNER = 'yatube.testing.DiscoverRunner'
+
+# Jobs
+
+# Side effects deferred to the run_jobs worker (see jobs.queue). Eager
+# jobs run inline, in the request, so no worker is needed.
+JOBS_ALWAYS_EAGER = DEBUG
+JOBS_POLL_INTERVAL = 1
+# A job still running this many seconds after its claim is given to
+# another worker.
+JOBS_LEASE = 60 * 5
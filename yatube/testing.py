@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner as BaseDiscoverRunner
+
+
+class TestSettings:
+    """Settings of a test session: a throwaway cache and N+1 failures.
+
+    The suites clear the cache freely, so they get a cache file of their
+    own instead of the shared BASE_DIR/cache.sqlite3 of the live site.
+    """
+
+    def enable(self):
+        self.directory = tempfile.mkdtemp(prefix='yatube-cache-')
+        caches = {
+            alias: dict(
+                config, LOCATION=os.path.join(self.directory, f'{alias}.db')
+            )
+            for alias, config in settings.CACHES.items()
+        }
+        self.override = override_settings(
+            CACHES=caches, QUERY_REPEAT_RAISE=True
+        )
+        self.override.enable()
+
+    def disable(self):
+        self.override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class DiscoverRunner(BaseDiscoverRunner):
+    """The default runner with TestSettings on."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = TestSettings()
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)